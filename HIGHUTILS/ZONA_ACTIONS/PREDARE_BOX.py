@@ -18,7 +18,7 @@ from SOURCES.UTILS.REAL import getRealCoordinates
 from SOURCES.UTILS.BOX_ALIGNMENT_FINE import BoxTracker, evaluate_target_box
 from SOURCES.UTILS.FINE_DIRECTIONS import getFINEcmd
 from SOURCES.UTILS.CONTROL_SERVO import executa_comanda
-from SOURCES.USART_COM.serial_module import process_command
+from SOURCES.USART_COM.serial_module import process_command, get_last_command_id
 from SOURCES.UTILS.COARSE_DIRECTIONS import getFirstCommand, getAllCommands
 from SOURCES.CAMERA.camera_session import init_camera, stop_camera, capture_and_process_session
 from SOURCES.UTILS.GET_FREE import analyze_zone_and_find_spot
@@ -68,7 +68,8 @@ def get_free_spot(image_copy,session_data,box_id):
 
     
     # Apelează funcția de analiză pentru a căuta un loc liber, cu max_boxes=3 și debug=True
-    result = analyze_zone_and_find_spot(image_copy, session_data, max_boxes=3, ignore_box_id=box_id, debug=False)
+    result = analyze_zone_and_find_spot(image_copy, session_data, max_boxes=3, ignore_box_id=box_id, debug=False,
+                                        motion_id=get_last_command_id())
 
 
     if isinstance(result, tuple) and len(result) == 2:
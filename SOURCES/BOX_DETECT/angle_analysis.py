@@ -1,8 +1,17 @@
+import os
+import sys
 import cv2
 import math
 import numpy as np
 from collections import Counter
 
+# Adaugă directorul SOURCES la sys.path pentru importurile din CAMERA
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from CAMERA.frame_context import convert_roi, frame_image
+
 def quantize_angle(a):
     """
     Quantizes an angle (in degrees) into one of the discrete levels: 0, 15, 25, 35, or 45.
@@ -31,7 +40,8 @@ def get_box_inclination_angle(image, tracked_pkg, margin=10, debug=False):
     and detects lines using the Hough transform. The detected line angles are then
     quantized to discrete values, and the most common value is returned as the inclination angle.
     
-    :param image: A copy of the image (numpy array) to be processed.
+    :param image: The image (numpy array; only the ROI is converted) or its FrameContext
+                  (the grayscale conversion is shared with the other boxes of the same frame).
     :param tracked_pkg: Dictionary with at least "position" (tuple) and "size" (tuple) keys.
     :param margin: Extra margin (in pixels) added around the bounding box for ROI extraction.
     :param debug: If True, shows the ROI with detected lines.
@@ -49,11 +59,10 @@ def get_box_inclination_angle(image, tracked_pkg, margin=10, debug=False):
     roi_x2 = min(image.shape[1], int(x + w / 2 + margin))
     roi_y2 = min(image.shape[0], int(y + h / 2 + margin))
     
-    roi = image[roi_y1:roi_y2, roi_x1:roi_x2]
-    roi_h, roi_w = roi.shape[:2]
+    roi_h, roi_w = roi_y2 - roi_y1, roi_x2 - roi_x1
     
-    # Preprocess ROI: convert to grayscale, apply blur, and detect edges
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    # Preprocess ROI: grayscale (shared per frame, or just the ROI for a plain array), blur, edges
+    gray = convert_roi(image, cv2.COLOR_BGR2GRAY, roi_y1, roi_y2, roi_x1, roi_x2)
     gray = cv2.GaussianBlur(gray, (5, 5), 0)
     edges = cv2.Canny(gray, 50, 150, apertureSize=3)
     
@@ -63,6 +72,9 @@ def get_box_inclination_angle(image, tracked_pkg, margin=10, debug=False):
     
     raw_angles = []
     quantized_angles = []
+    if debug:
+        # the frame is read-only; draw on a private copy of the ROI
+        roi = frame_image(image)[roi_y1:roi_y2, roi_x1:roi_x2].copy()
     
     if lines is not None:
         for line in lines:
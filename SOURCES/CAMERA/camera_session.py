@@ -33,6 +33,7 @@ from BOX_DETECT.letter_detect import detect_letters
 from BOX_DETECT.box_detect import detect_objects
 from BOX_DETECT.utils import assign_letters_to_packages, calculate_box_distance, build_session_data
 from BOX_DETECT.angle_analysis import get_box_inclination_angle
+from CAMERA.frame_context import FrameContext
 
 # Setări implicite
 ZONE_TOP_LEFT = (200, 40)
@@ -183,11 +184,12 @@ def capture_and_process_session():
     session_data = build_session_data(matched_packages, box_distances, detections_boxes)
     session_data = merge_similar_packages(session_data, merge_distance_threshold=MERGE_DISTANCE_THRESHOLD)
     
-    # Asigură-te că fiecare cutie are cheia "angle"
+    # Asigură-te că fiecare cutie are cheia "angle" (gray-ul cadrului se calculează o singură dată)
+    frame_ctx = FrameContext(processed_image)
     for pkg in session_data.values():
         if "angle" not in pkg:
             try:
-                pkg["angle"] = get_box_inclination_angle(processed_image, pkg, margin=5, debug=False)
+                pkg["angle"] = get_box_inclination_angle(frame_ctx, pkg, margin=5, debug=False)
             except Exception:
                 pkg["angle"] = 0
                 
@@ -226,10 +228,11 @@ def camera_loop(callback=None, only_image=False):
             session_data = build_session_data(matched_packages, box_distances, detections_boxes)
             session_data = merge_similar_packages(session_data, merge_distance_threshold=MERGE_DISTANCE_THRESHOLD)
             # Asigură cheia "angle"
+            frame_ctx = FrameContext(processed_image)
             for pkg in session_data.values():
                 if "angle" not in pkg:
                     try:
-                        pkg["angle"] = get_box_inclination_angle(processed_image, pkg, margin=5, debug=False)
+                        pkg["angle"] = get_box_inclination_angle(frame_ctx, pkg, margin=5, debug=False)
                     except Exception:
                         pkg["angle"] = 0
         
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Module: frame_context.py
+Descriere: Cache pentru reprezentările derivate ale unui singur cadru (gray, HSV, blur, resize).
+  - FrameContext împachetează imaginea și calculează fiecare reprezentare la prima cerere, o singură dată.
+  - Toate array-urile returnate sunt view-uri read-only; cine vrea să deseneze pe ele face .copy().
+  - Modulele de percepție (get_line, detect_zona, angle_analysis, tracked_position) acceptă
+    fie un np.ndarray, fie un FrameContext; as_frame_context() face conversia.
+  - Analizele pe un ROI mic folosesc convert_roi(): cu un FrameContext taie conversia partajată,
+    cu un np.ndarray convertesc doar ROI-ul (ca înainte), fără să plătească tot cadrul.
+
+Utilizare exemplu:
+    ctx = FrameContext(capture_raw_image())
+    data = extract_dual_data(ctx)
+    boxes = detect_colored_boxes_multi([ctx])
+"""
+
+import cv2
+import numpy as np
+
+
+def _read_only(arr):
+    view = arr.view()
+    view.flags.writeable = False
+    return view
+
+
+class FrameContext:
+    def __init__(self, image):
+        self._image = _read_only(image)
+        self._cache = {}
+
+    @property
+    def image(self):
+        """Imaginea originală (read-only)."""
+        return self._image
+
+    @property
+    def shape(self):
+        return self._image.shape
+
+    def derive(self, key, compute):
+        """
+        Returnează reprezentarea memorată sub 'key'; la prima cerere o calculează
+        cu compute() și o păstrează read-only pentru restul cadrului.
+        """
+        if key not in self._cache:
+            self._cache[key] = _read_only(compute())
+        return self._cache[key]
+
+    def convert(self, code):
+        """cv2.cvtColor(image, code), calculat o singură dată per cod."""
+        return self.derive(("cvt", code), lambda: cv2.cvtColor(self._image, code))
+
+    @property
+    def gray(self):
+        return self.convert(cv2.COLOR_BGR2GRAY)
+
+    @property
+    def hsv(self):
+        return self.convert(cv2.COLOR_BGR2HSV)
+
+    def median_gray(self, ksize=5):
+        return self.derive(("median_gray", ksize), lambda: cv2.medianBlur(self.gray, ksize))
+
+    def gaussian_gray(self, ksize=5):
+        return self.derive(("gaussian_gray", ksize),
+                           lambda: cv2.GaussianBlur(self.gray, (ksize, ksize), 0))
+
+    def resized(self, size, interpolation=cv2.INTER_LINEAR):
+        """Imaginea redimensionată la size=(w, h)."""
+        return self.derive(("resize", tuple(size), interpolation),
+                           lambda: cv2.resize(self._image, tuple(size), interpolation=interpolation))
+
+
+def frame_image(frame):
+    """Imaginea (np.ndarray) a unui cadru dat ca np.ndarray sau FrameContext."""
+    if isinstance(frame, np.ndarray):
+        return frame
+    return frame.image
+
+
+def convert_roi(frame, code, y1, y2, x1, x2):
+    """
+    cv2.cvtColor(code) pentru regiunea [y1:y2, x1:x2] a cadrului.
+    Un FrameContext refolosește conversia cadrului întreg (calculată o dată, partajată cu ceilalți);
+    un np.ndarray nu are cu cine partaja conversia, deci se convertește doar regiunea.
+    """
+    if isinstance(frame, np.ndarray):
+        return cv2.cvtColor(frame[y1:y2, x1:x2], code)
+    return frame.convert(code)[y1:y2, x1:x2]
+
+
+def as_frame_context(frame):
+    """Împachetează un np.ndarray într-un FrameContext; un FrameContext este returnat neschimbat."""
+    if isinstance(frame, np.ndarray):
+        return FrameContext(frame)
+    return frame
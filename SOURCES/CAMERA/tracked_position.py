@@ -26,9 +26,18 @@ Utilizare exemplu:
     # refined este un dicționar cu "refined_center" și "refined_bbox".
 """
 
+import os
+import sys
 import cv2
 import numpy as np
 
+# Adaugă directorul SOURCES la sys.path pentru importurile din CAMERA
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from CAMERA.frame_context import convert_roi
+
 def mosaic_effect(image, scale_down_factor=0.25):
     h, w = image.shape[:2]
     new_size = (int(w * scale_down_factor), int(h * scale_down_factor))
@@ -206,7 +215,8 @@ def analyze_detailed_position(image, bbox, hsv_lower, hsv_upper):
     Dacă nu se detectează regiuni semnificative, se returnează centrul ROI-ului.
     
     Parametri:
-      - image: imaginea curentă (BGR).
+      - image: imaginea curentă (BGR; se convertește doar ROI-ul) sau FrameContext-ul ei
+               (conversia HSV a cadrului întreg se face o singură dată și se partajează).
       - bbox: tuple (x1, y1, x2, y2) care definește ROI-ul.
       - hsv_lower: tuple cu valorile inferioare pentru threshold (H, S, V).
       - hsv_upper: tuple cu valorile superioare pentru threshold (H, S, V).
@@ -216,8 +226,7 @@ def analyze_detailed_position(image, bbox, hsv_lower, hsv_upper):
       - "refined_bbox": bounding box-ul (x1, y1, x2, y2) extins pe baza regiunii detectate.
     """
     x1, y1, x2, y2 = bbox
-    roi = image[y1:y2, x1:x2]
-    hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+    hsv_roi = convert_roi(image, cv2.COLOR_BGR2HSV, y1, y2, x1, x2)
     mask = cv2.inRange(hsv_roi, np.array(hsv_lower), np.array(hsv_upper))
     
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
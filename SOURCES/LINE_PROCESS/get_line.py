@@ -1,6 +1,18 @@
+import os
+import sys
 import cv2
 import numpy as np
 import time
+from functools import lru_cache
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Adaugă directorul SOURCES la sys.path pentru importurile din CAMERA
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from CAMERA.frame_context import as_frame_context
 
 
 
@@ -27,35 +39,67 @@ directions=[
 
 
 
+@lru_cache(maxsize=16)
+def _point_pairs(n):
+    return np.triu_indices(n, k=1)
+
+
+def fit_line_ransac(xs, ys, max_deviation=170, max_iterations=64):
+    """
+    Robust fit of y = m*x + b. Candidate lines through point pairs (all pairs, or a
+    fixed-seed sample of `max_iterations` of them) are scored together in one broadcast;
+    the line with the most inliers (ties: smallest inlier residual) is refit by least
+    squares on its inliers.
+
+    Returns:
+        (m, b, inlier_mask) where inlier_mask is a NumPy bool array over xs
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+
+    i, j = _point_pairs(len(xs))
+    keep = xs[i] != xs[j]
+    i, j = i[keep], j[keep]
+    if len(i) > max_iterations:
+        pick = np.random.default_rng(0).choice(len(i), max_iterations, replace=False)
+        i, j = i[pick], j[pick]
+
+    if len(i):
+        m = (ys[j] - ys[i]) / (xs[j] - xs[i])
+        b = ys[i] - m * xs[i]
+        residuals = np.abs(ys[None, :] - (m[:, None] * xs[None, :] + b[:, None]))
+        inliers = residuals <= max_deviation
+        cost = np.where(inliers, residuals, 0).sum(axis=1)
+        # most inliers first, smallest inlier residual as tie-break
+        score = inliers.sum(axis=1) * (len(xs) * max_deviation + 1.0) - cost
+        mask = inliers[np.argmax(score)]
+    else:
+        mask = np.ones(len(xs), dtype=bool)
+
+    # Refine on the inliers
+    A = np.vstack([xs[mask], np.ones(mask.sum())]).T
+    m, b = np.linalg.lstsq(A, ys[mask], rcond=None)[0]
+    inlier_mask = np.abs(ys - (m * xs + b)) <= max_deviation
+    return m, b, inlier_mask
+
+
 def filter_linear_outliers(slices, max_deviation=170):
-    # Extract slice indexes and distances from valid points
-    valid_points = [(i, d) for i, d, v in slices if v and d is not None]
-    if len(valid_points) < 3:
+    # Positions of the valid points inside `slices`
+    valid_idx = [k for k, (i, d, v) in enumerate(slices) if v and d is not None]
+    if len(valid_idx) < 3:
         return slices  # not enough data to filter
 
-    xs, ys = zip(*valid_points)
-    xs = np.array(xs)
-    ys = np.array(ys)
-
-    # Fit a linear model: y = a*x + b
-    A = np.vstack([xs, np.ones(len(xs))]).T
-    m, b = np.linalg.lstsq(A, ys, rcond=None)[0]
+    xs = np.array([slices[k][0] for k in valid_idx])
+    ys = np.array([slices[k][1] for k in valid_idx])
 
-    # Compute predictions and residuals
-    predicted = m * xs + b
-    residuals = np.abs(ys - predicted)
+    # Robust linear model: y = a*x + b; a single bad slice cannot drag the fit
+    _, _, inlier_mask = fit_line_ransac(xs, ys, max_deviation)
 
     # Mark those with high residuals as invalid
-    filtered = []
-    for i, (slice_index, distance, valid) in enumerate(slices):
-        if valid and distance is not None and (slice_index, distance) in valid_points:
-            res = np.abs(distance - (m * slice_index + b))
-            if res > max_deviation:
-                filtered.append((slice_index, distance, 0))  # mark as invalid
-            else:
-                filtered.append((slice_index, distance, 1))  # keep
-        else:
-            filtered.append((slice_index, distance, valid))
+    filtered = list(slices)
+    for k, inlier in zip(valid_idx, inlier_mask):
+        slice_index, distance, _ = slices[k]
+        filtered[k] = (slice_index, distance, 1 if inlier else 0)
 
     return filtered
 
@@ -67,20 +111,21 @@ def filter_linear_outliers(slices, max_deviation=170):
 
 def detect_colored_boxes_multi(frames, mosaic_size=128, min_area=50, iou_threshold=0.1):
     """
-    frames: list of BGR images (e.g. [img1, img2, img3])
+    frames: list of BGR images or FrameContext objects (e.g. [img1, img2, img3])
     Returns:
       - merged_boxes: list of (color, (x, y, w, h)) across all frames
       - debug_img: mosaic image (from last frame) with merged boxes drawn
     """
     assert len(frames) >= 1, "Need at least one frame"
+    frames = [as_frame_context(f) for f in frames]
     height, width = frames[0].shape[:2]
 
     raw_boxes = []
     # Process each frame
-    for img in frames:
-        img= cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        small = cv2.resize(img, (mosaic_size, mosaic_size), interpolation=cv2.INTER_LINEAR)
-        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    for ctx in frames:
+        # channel swap commutes with resize, so BGR2RGB + BGR2HSV == RGB2HSV on the small image
+        small = ctx.resized((mosaic_size, mosaic_size), cv2.INTER_LINEAR)
+        hsv = ctx.derive(("line_boxes_hsv", mosaic_size), lambda: cv2.cvtColor(small, cv2.COLOR_RGB2HSV))
         color_ranges = {
             'red': [([0, 100, 100], [10, 255, 255]), ([160, 100, 100], [180, 255, 255])],
             'green': [([40, 70, 70], [80, 255, 255])],
@@ -112,7 +157,7 @@ def detect_colored_boxes_multi(frames, mosaic_size=128, min_area=50, iou_thresho
     merged_boxes = merge_boxes(raw_boxes, iou_threshold)
 
     # create debug mosaic image from last frame
-    debug_img = cv2.resize(frames[-1], (mosaic_size, mosaic_size))
+    debug_img = frames[-1].resized((mosaic_size, mosaic_size), cv2.INTER_LINEAR)
     for color, (x, y, w, h) in merged_boxes:
         x_m = int(x * mosaic_size / width); y_m = int(y * mosaic_size / height)
         w_m = int(w * mosaic_size / width); h_m = int(h * mosaic_size / height)
@@ -124,30 +169,61 @@ def detect_colored_boxes_multi(frames, mosaic_size=128, min_area=50, iou_thresho
 
     return merged_boxes
 
+def _box_iou(a, b):
+    _, (ax, ay, aw, ah) = a
+    _, (bx, by, bw, bh) = b
+    x1 = max(ax, bx); y1 = max(ay, by)
+    x2 = min(ax + aw, bx + bw); y2 = min(ay + ah, by + bh)
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0
+
+
+def _overlap_graph(boxes, iou_threshold):
+    """
+    neighbours[i] = ascending j > i with the same color and IoU > iou_threshold.
+    A sorted sweep on x only pairs boxes whose x-intervals overlap, which is
+    required for a positive intersection (any pair passes a negative threshold).
+    """
+    n = len(boxes)
+    neighbours = [[] for _ in range(n)]
+    if iou_threshold < 0:
+        candidates = ((i, j) for i in range(n) for j in range(i + 1, n))
+    else:
+        candidates = []
+        active = []
+        for k in sorted(range(n), key=lambda k: boxes[k][1][0]):
+            x = boxes[k][1][0]
+            active = [a for a in active if boxes[a][1][0] + boxes[a][1][2] > x]
+            candidates.extend((min(a, k), max(a, k)) for a in active)
+            active.append(k)
+
+    for i, j in candidates:
+        if boxes[i][0] == boxes[j][0] and _box_iou(boxes[i], boxes[j]) > iou_threshold:
+            neighbours[i].append(j)
+    for nb in neighbours:
+        nb.sort()
+    return neighbours
+
+
 def merge_boxes(boxes, iou_threshold=0.1):
+    """
+    Each box not yet used seeds a group with the unused boxes that overlap it directly
+    (same grouping as the original pairwise pass); candidate pairs come from an x sweep.
+    """
     merged = []
     used = [False] * len(boxes)
-
-    def iou(a, b):
-        _, (ax, ay, aw, ah) = a
-        _, (bx, by, bw, bh) = b
-        x1 = max(ax, bx); y1 = max(ay, by)
-        x2 = min(ax + aw, bx + bw); y2 = min(ay + ah, by + bh)
-        inter = max(0, x2 - x1) * max(0, y2 - y1)
-        union = aw * ah + bw * bh - inter
-        return inter / union if union else 0
+    neighbours = _overlap_graph(boxes, iou_threshold)
 
     for i in range(len(boxes)):
         if used[i]: continue
         col_i, (x, y, w, h) = boxes[i]
         used[i] = True
         group = [(col_i, (x, y, w, h))]
-        for j in range(i + 1, len(boxes)):
+        for j in neighbours[i]:
             if used[j]: continue
-            col_j, _ = boxes[j]
-            if col_i == col_j and iou(boxes[i], boxes[j]) > iou_threshold:
-                group.append(boxes[j])
-                used[j] = True
+            group.append(boxes[j])
+            used[j] = True
         xs = [b[1][0] for b in group]; ys = [b[1][1] for b in group]
         xs2 = [b[1][0] + b[1][2] for b in group]; ys2 = [b[1][1] + b[1][3] for b in group]
         merged.append((col_i, (min(xs), min(ys), max(xs2)-min(xs), max(ys2)-min(ys))))
@@ -164,16 +240,75 @@ def merge_boxes(boxes, iou_threshold=0.1):
 
 
 
-def get_binary_mosaic_with_exclusion(image, exclude_bottom_ratio=0.35):
-    height, width, _ = image.shape
-    excl_zone_y = int(height * (1 - exclude_bottom_ratio))
+class LineROI:
+    """
+    Line-pipeline geometry for one camera mounting:
+      - crop: (top, bottom, left, right) fractions of the frame, the only pixels that
+        get blurred, thresholded and morphed;
+      - body: robot body zone, from slice `body_first_slice` down and x in `body_x`
+        (fractions of the width). The mosaic method skips it in slices
+        i >= body_first_slice for any num_slices, as before (i > 4, x in [0.25, 0.75]).
+        The contour/skeleton method (always 8 slices) blanks it only with
+        blank_body_contours=True.
+    The defaults reproduce the original analysis exactly: full-frame crop and no body
+    blanking on the contour path. The current mounting needs the full frame (the slice
+    logs have line points in every slice, across the whole width), so the defaults bring
+    no speedup; the saving comes from a crop on a mounting that sees unused rows, e.g.
+    LineROI(crop=(0.25, 1.0, 0.0, 1.0)).
+    """
+
+    def __init__(self, crop=(0.0, 1.0, 0.0, 1.0), body_first_slice=5, body_x=(0.25, 0.75),
+                 blank_body_contours=False):
+        self.crop = crop
+        self.body_first_slice = body_first_slice
+        self.body_x = body_x
+        self.blank_body_contours = blank_body_contours
+
+    @staticmethod
+    def _to_px(rect, height, width):
+        top, bottom, left, right = rect
+        return int(height * top), int(height * bottom), int(width * left), int(width * right)
+
+    def crop_px(self, height, width):
+        """(y0, y1, x0, x1) of the crop in pixels."""
+        return self._to_px(self.crop, height, width)
+
+    def body_px(self, height, width, num_slices=8):
+        """(y0, y1, x0, x1) of the body zone in full-frame pixels, for frames cut into num_slices slices."""
+        left, right = self.body_x
+        return self.body_first_slice * (height // num_slices), height, int(width * left), int(width * right)
+
+
+DEFAULT_LINE_ROI = LineROI()
+
+
+def binary_mosaic_gray(image, roi=None):
+    """
+    Single-channel 128-cell binary mosaic at full size, cached on the frame context.
+    Only the ROI crop is thresholded and resized; pixels outside it stay 0.
+    """
+    ctx = as_frame_context(image)
+    roi = roi or DEFAULT_LINE_ROI
+    height, width = ctx.shape[:2]
+    y0, y1, x0, x1 = roi.crop_px(height, width)
+
+    def compute():
+        mosaic = np.zeros((height, width), np.uint8)
+        _, binary = cv2.threshold(ctx.gray[y0:y1, x0:x1], 90, 255, cv2.THRESH_BINARY_INV)
+        cells = (max(1, round((x1 - x0) * 128 / width)), max(1, round((y1 - y0) * 128 / height)))
+        small = cv2.resize(binary, cells, interpolation=cv2.INTER_LINEAR)
+        mosaic[y0:y1, x0:x1] = cv2.resize(small, (x1 - x0, y1 - y0), interpolation=cv2.INTER_NEAREST)
+        return mosaic
+
+    return ctx.derive(("line_binary_mosaic", y0, y1, x0, x1), compute)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 90, 255, cv2.THRESH_BINARY_INV)
 
-    small = cv2.resize(binary, (128, 128), interpolation=cv2.INTER_LINEAR)
-    mosaic = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
-    mosaic_colored = cv2.cvtColor(mosaic, cv2.COLOR_GRAY2BGR)
+def get_binary_mosaic_with_exclusion(image, exclude_bottom_ratio=0.35, roi=None):
+    ctx = as_frame_context(image)
+    height = ctx.shape[0]
+    excl_zone_y = int(height * (1 - exclude_bottom_ratio))
+
+    mosaic_colored = cv2.cvtColor(binary_mosaic_gray(ctx, roi), cv2.COLOR_GRAY2BGR)
 
     return mosaic_colored, excl_zone_y
 
@@ -183,14 +318,16 @@ def point_in_box(px, py, boxes):
             return True
     return False
 
-def analyze_binary_mosaic_with_guidance(image, boxes=[], num_slices=8, exclude_bottom_ratio=0.35, point_spacing=25, min_line_thickness=3):
-    mosaic_colored, excl_zone_y = get_binary_mosaic_with_exclusion(image, exclude_bottom_ratio)
+def analyze_binary_mosaic_with_guidance(image, boxes=[], num_slices=8, exclude_bottom_ratio=0.35, point_spacing=25, min_line_thickness=3, roi=None):
+    ctx = as_frame_context(image)
+    roi = roi or DEFAULT_LINE_ROI
+    mosaic_colored, excl_zone_y = get_binary_mosaic_with_exclusion(ctx, exclude_bottom_ratio, roi)
+    mosaic_gray = binary_mosaic_gray(ctx, roi)
     height, width = mosaic_colored.shape[:2]
     center_x = width // 2
 
-    excl_margin = 0.05
-    excl_x_start = max(0, int(width * (0.3 - excl_margin)))
-    excl_x_end = min(width, int(width * (0.7 + excl_margin)))
+    # robot body zone: skipped from slice roi.body_first_slice down, whatever num_slices is
+    _, _, excl_x_start, excl_x_end = roi.body_px(height, width, num_slices)
 
     slice_height = height // num_slices
     raw_results = []
@@ -198,23 +335,22 @@ def analyze_binary_mosaic_with_guidance(image, boxes=[], num_slices=8, exclude_b
     for i in range(num_slices):
         y_start = i * slice_height
         y_end = y_start + slice_height
-        band = mosaic_colored[y_start:y_end, :]
-        band_gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+        band_gray = mosaic_gray[y_start:y_end, :]
         found = False
 
         for x in range(0, width - min_line_thickness, point_spacing):
             cx = x + min_line_thickness // 2
             cy = y_start + slice_height // 2
 
-            if i > 4 and (x + min_line_thickness >= excl_x_start and x <= excl_x_end):
+            if i >= roi.body_first_slice and (x + min_line_thickness >= excl_x_start and x <= excl_x_end):
                 continue
             if i < 5 and excl_zone_y <= cy <= height:
                 continue
             if point_in_box(cx, cy, boxes):
                 continue
 
-            roi = band_gray[:, x:x + min_line_thickness]
-            if cv2.countNonZero(roi) > 3 * min_line_thickness:
+            column = band_gray[:, x:x + min_line_thickness]
+            if cv2.countNonZero(column) > 3 * min_line_thickness:
                 raw_results.append((i, cx - center_x, 1))
                 found = True
                 break
@@ -272,18 +408,21 @@ def pretty_print_slices(slices_data):
 
 def filter_largest_component(binary_img, min_size=25):
     num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(binary_img, connectivity=8)
-    mask = np.zeros_like(binary_img)
 
-    for i in range(1, num_labels):  # skip background
-        area = stats[i, cv2.CC_STAT_AREA]
-        if area >= min_size:
-            mask[labels == i] = 255
-    return mask
+    # label -> output value lookup table, applied in a single indexing pass
+    lut = np.where(stats[:, cv2.CC_STAT_AREA] >= min_size, 255, 0).astype(binary_img.dtype)
+    lut[0] = 0  # skip background
+    return lut[labels]
 
 
-def median_adapt(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    mblur = cv2.medianBlur(gray, 5)
+def median_adapt(image, roi=None):
+    """Adaptive threshold of the median-blurred gray image; with `roi`, of its crop only."""
+    ctx = as_frame_context(image)
+    if roi is None:
+        mblur = ctx.median_gray(5)
+    else:
+        y0, y1, x0, x1 = roi.crop_px(*ctx.shape[:2])
+        mblur = cv2.medianBlur(ctx.gray[y0:y1, x0:x1], 5)
     adapt = cv2.adaptiveThreshold(mblur, 255,
                                   cv2.ADAPTIVE_THRESH_MEAN_C,
                                   cv2.THRESH_BINARY_INV,
@@ -299,18 +438,101 @@ def preprocess_binary(binary_img):
     return cleaned
 
 
-def detect_line_methods(binary_image, original_image):
+# Skeleton settings: thinning stops after this many passes and runs on the
+# line ROI downscaled by this factor (1.0 = full resolution).
+SKELETON_MAX_ITER = 20
+SKELETON_SCALE = 0.5
+
+# cv2.ximgproc is only present in opencv-contrib builds
+_ximgproc = getattr(cv2, "ximgproc", None)
+
+
+def zhang_suen_thinning(binary_img, max_iterations=SKELETON_MAX_ITER):
+    """
+    Zhang-Suen thinning vectorized with NumPy. Each pass evaluates both
+    sub-iterations over the whole image at once; stops early when nothing changes.
+    """
+    img = np.pad((binary_img > 0).astype(np.uint8), 1)
+
+    for _ in range(max_iterations):
+        changed = False
+        for step in (0, 1):
+            # neighbours P2..P9, clockwise starting from north
+            p2 = img[:-2, 1:-1]; p3 = img[:-2, 2:]; p4 = img[1:-1, 2:]; p5 = img[2:, 2:]
+            p6 = img[2:, 1:-1]; p7 = img[2:, :-2]; p8 = img[1:-1, :-2]; p9 = img[:-2, :-2]
+            ring = [p2, p3, p4, p5, p6, p7, p8, p9, p2]
+
+            b = p2 + p3 + p4 + p5 + p6 + p7 + p8 + p9
+            a = sum((ring[k] == 0) & (ring[k + 1] == 1) for k in range(8))
+            if step == 0:
+                c = p2 & p4 & p6
+                d = p4 & p6 & p8
+            else:
+                c = p2 & p4 & p8
+                d = p2 & p6 & p8
+
+            remove = (img[1:-1, 1:-1] == 1) & (b >= 2) & (b <= 6) & (a == 1) & (c == 0) & (d == 0)
+            if remove.any():
+                img[1:-1, 1:-1][remove] = 0
+                changed = True
+        if not changed:
+            break
+
+    return img[1:-1, 1:-1] * 255
+
+
+def skeletonize(binary_img, max_iterations=SKELETON_MAX_ITER, scale=SKELETON_SCALE, min_size=25):
+    """
+    Thins the line mask to a 1px skeleton, keeping only components >= min_size.
+    Works on the bounding ROI of the foreground, downscaled by `scale`; uses
+    cv2.ximgproc.thinning when opencv-contrib is installed, otherwise Zhang-Suen in NumPy.
+    Skeleton pixels are mapped back to full-resolution coordinates.
+    """
+    skel = np.zeros_like(binary_img)
+    pts = cv2.findNonZero(binary_img)
+    if pts is None:
+        return skel
+
+    x, y, w, h = cv2.boundingRect(pts)
+    roi = binary_img[y:y + h, x:x + w]
+    small_w = max(1, int(w * scale))
+    small_h = max(1, int(h * scale))
+    if (small_w, small_h) != (w, h):
+        roi = cv2.resize(roi, (small_w, small_h), interpolation=cv2.INTER_NEAREST)
+
+    if _ximgproc is not None:
+        thin = _ximgproc.thinning(roi, thinningType=_ximgproc.THINNING_ZHANGSUEN)
+    else:
+        thin = zhang_suen_thinning(roi, max_iterations)
+
+    # component size shrinks linearly with the scale on a 1px skeleton
+    thin = filter_largest_component(thin, min_size=max(1, int(round(min_size * scale))))
+
+    ys, xs = np.nonzero(thin)
+    skel[y + ys * h // small_h, x + xs * w // small_w] = 255
+    return skel
+
+
+def detect_line_methods(binary_image, original_image, skeleton_max_iter=SKELETON_MAX_ITER,
+                        skeleton_scale=SKELETON_SCALE, offset=(0, 0), frame_shape=None):
+    """
+    Contour and skeleton line detection. `binary_image` may be a crop of the frame:
+    `offset` is its (x, y) top-left corner and `frame_shape` the full frame shape;
+    all returned coordinates and masks are in full-frame pixels.
+    """
     results = {}
-    height, width = binary_image.shape
+    crop_h, crop_w = binary_image.shape
+    height, width = frame_shape[:2] if frame_shape is not None else (crop_h, crop_w)
+    ox, oy = offset
     center_x = width // 2
 
     cleaned = preprocess_binary(binary_image)
 
     ## === Contours === ##
-    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(ox, oy))
     big_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > 150]
 
-    contour_mask = np.zeros_like(cleaned)
+    contour_mask = np.zeros((height, width), np.uint8)
     cv2.drawContours(contour_mask, big_contours, -1, 255, -1)
 
     # Get center of mass for largest contour
@@ -324,19 +546,9 @@ def detect_line_methods(binary_image, original_image):
             contour_point = (cx, cy)
 
     ## === Skeleton === ##
-    skel = np.zeros(cleaned.shape, np.uint8)
-    element = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
-    img = cleaned.copy()
-    while True:
-        eroded = cv2.erode(img, element)
-        temp = cv2.dilate(eroded, element)
-        temp = cv2.subtract(img, temp)
-        skel = cv2.bitwise_or(skel, temp)
-        img = eroded.copy()
-        if cv2.countNonZero(img) == 0:
-            break
-
-    skeleton_clean = filter_largest_component(skel)
+    skeleton_clean = np.zeros((height, width), np.uint8)
+    skeleton_clean[oy:oy + crop_h, ox:ox + crop_w] = skeletonize(
+        cleaned, max_iterations=skeleton_max_iter, scale=skeleton_scale)
     skeleton_point = None
     ys, xs = np.where(skeleton_clean > 0)
     if len(xs) > 0:
@@ -380,10 +592,25 @@ def detect_line_methods(binary_image, original_image):
 
 
 
+def _stack_slice_points(*slice_dicts):
+    """Flattens {slice_index: [(x, y), ...]} dicts into (slice_indices[N], points[N, 2]) arrays."""
+    idx_parts, pt_parts = [], []
+    for slices in slice_dicts:
+        for slice_idx, pts in slices.items():
+            if len(pts):
+                pt_parts.append(np.asarray(pts, dtype=np.int64).reshape(-1, 2))
+                idx_parts.append(np.full(len(pts), slice_idx, dtype=np.int64))
+    if not pt_parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(idx_parts), np.concatenate(pt_parts)
+
+
 def confirm_analyzed_points(data, radius=20):
     """
     Confirms analyzed points from `analyze_binary_mosaic_with_guidance` by checking
-    for nearby skeleton/contour points from the same slice.
+    for nearby skeleton/contour points from the same slice (only the slice groups named
+    in data["confirm_with"], when present). All mosaic points are tested against all
+    candidates in one broadcast (same slice & squared distance).
 
     Args:
         data: output from `extract_dual_data()`
@@ -392,68 +619,181 @@ def confirm_analyzed_points(data, radius=20):
     Returns:
         List of tuples: (slice_index, deviation, (x, y), confirmed)
     """
-    confirmed_results = []
+    mosaic_points = data["mosaic"]
+    confirm_with = data.get("confirm_with", ("contour_slices", "skeleton_slices"))
+    cand_idx, cand_pts = _stack_slice_points(*(data[key] for key in confirm_with))
 
-    def is_near(px, py, points, threshold):
-        for x, y in points:
-            if (x - px)**2 + (y - py)**2 <= threshold**2:
-                return True
-        return False
+    queries = [(slice_idx, pos) for slice_idx, _, pos in mosaic_points if pos is not None]
+    hits = np.zeros(len(queries), dtype=bool)
+    if queries and len(cand_idx):
+        q_idx = np.array([slice_idx for slice_idx, _ in queries], dtype=np.int64)
+        q_pts = np.array([pos for _, pos in queries], dtype=np.int64)
 
-    mosaic_points = data["mosaic"]
-    contours = data["contour_slices"]
-    skeletons = data["skeleton_slices"]
+        same_slice = q_idx[:, None] == cand_idx[None, :]
+        d2 = ((q_pts[:, None, :] - cand_pts[None, :, :]) ** 2).sum(axis=2)
+        hits = (same_slice & (d2 <= radius ** 2)).any(axis=1)
 
+    confirmed_results = []
+    q = 0
     for slice_idx, deviation, pos in mosaic_points:
         if pos is None:
             confirmed_results.append((slice_idx, deviation, None, False))
             continue
+        confirmed_results.append((slice_idx, deviation, pos, bool(hits[q])))
+        q += 1
 
-        cx, cy = pos
-        confirmed = False
-        candidates = contours.get(slice_idx, []) + skeletons.get(slice_idx, [])
+    return confirmed_results
 
-        if is_near(cx, cy, candidates, radius):
-            confirmed = True
 
-        confirmed_results.append((slice_idx, deviation, pos, confirmed))
 
-    return confirmed_results
 
 
+# Time budget (seconds) for the two line methods in extract_dual_data.
+LINE_METHODS_DEADLINE = 0.15
+
+# Persistent pool for the line methods; OpenCV releases the GIL so both run in parallel.
+# Extra workers absorb a straggler from the previous frame that missed its deadline.
+_line_pool = None
+
+# Per method: the call still in flight (at most one, never resubmitted while running).
+_line_futures = {}
+
+
+def _get_line_pool():
+    global _line_pool
+    if _line_pool is None:
+        _line_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="line_methods")
+    return _line_pool
+
+
+def _submit_line_method(name, fn, *args):
+    """
+    Submits one line method, unless its call from an earlier frame is still running.
+    Returns the new future, or None when the method is skipped for this frame.
+    """
+    previous = _line_futures.get(name)
+    if previous is not None and not previous.done():
+        return None
+    future = _get_line_pool().submit(fn, *args)
+    _line_futures[name] = future
+    return future
+
+
+def _run_contour_method(ctx, roi):
+    # Prepare the ROI crop using median threshold (optionally blank the robot body), then run contour/skeleton detection
+    height, width = ctx.shape[:2]
+    y0, _, x0, _ = roi.crop_px(height, width)
+    bin_img = median_adapt(ctx, roi)
 
+    if roi.blank_body_contours:
+        by0, by1, bx0, bx1 = roi.body_px(height, width)
+        bin_img[max(by0 - y0, 0):max(by1 - y0, 0), max(bx0 - x0, 0):max(bx1 - x0, 0)] = 0
 
+    return detect_line_methods(bin_img, ctx.image, offset=(x0, y0), frame_shape=ctx.shape)
 
-def extract_dual_data(image, num_slices=8):
+
+def _mosaic_from_line_results(line_results, width):
+    """Builds mosaic-style points (slice_idx, deviation, (x, y)) from the skeleton slices."""
+    center_x = width // 2
+    slice_height = line_results["slice_height"]
+    points = []
+    for idx in range(line_results["slice_count"]):
+        pts = line_results["skeleton_slices"][idx]
+        if pts:
+            cx = int(np.mean([x for x, _ in pts]))
+            cy = idx * slice_height + slice_height // 2
+            points.append((idx, cx - center_x, (cx, cy)))
+        else:
+            points.append((idx, None, None))
+    return points
+
+
+def extract_dual_data(image, num_slices=8, deadline=LINE_METHODS_DEADLINE, roi=None):
     """
-    Processes one image and returns data from both analysis methods:
+    Processes one image (ndarray or FrameContext) and returns data from both analysis methods:
     - Binary mosaic analysis (returns: [(slice_idx, deviation, (x, y)) or None])
     - Contour/Skeleton slice groups from line detection
 
+    Only the `roi` crop (LineROI, default DEFAULT_LINE_ROI) is thresholded and morphed.
+    The mosaic method skips the robot body zone; the contour method blanks it only if
+    roi.blank_body_contours is set. With the default ROI the results match the
+    original full-frame analysis.
+
+    Both methods run concurrently on a persistent thread pool. If one of them misses
+    `deadline` seconds, the other's result for this frame is used alone:
+    - mosaic only: no contour/skeleton slices, so every mosaic point stays unconfirmed;
+    - contour only: the mosaic points are rebuilt from the skeleton slices and confirmed
+      against the contour slices alone ("confirm_with").
+    A late call is cancelled if it has not started yet; one that is still running is not
+    resubmitted on the next frames until it finishes, and its result is discarded.
+    If neither method has a result for this frame, an empty (no line) result is returned
+    with "stale" set; callers should skip such frames rather than treat them as a lost line.
+
     Returns:
         {
             "mosaic": [(slice_index, deviation, (x, y))],
             "contour_slices": {slice_index: [(x, y), ...]},
             "skeleton_slices": {slice_index: [(x, y), ...]},
+            "confirm_with": the slice keys confirm_analyzed_points checks the mosaic against,
+            "methods": names of the methods whose results are used,
+            "stale": True if no method produced a result for this frame
         }
     """
+    ctx = as_frame_context(image)
+    roi = roi or DEFAULT_LINE_ROI
+    ctx.gray  # shared by both methods; compute it once before forking
+
     # Analyze binary mosaic (ignore mosaic_colored output)
-    _, mosaic_data = analyze_binary_mosaic_with_guidance(image, num_slices=num_slices)
+    futures = {
+        "mosaic": _submit_line_method(
+            "mosaic", lambda: analyze_binary_mosaic_with_guidance(ctx, num_slices=num_slices, roi=roi)[1]),
+        "contour": _submit_line_method("contour", _run_contour_method, ctx, roi),
+    }
+    submitted = [f for f in futures.values() if f is not None]
+    done = wait(submitted, timeout=deadline)[0] if submitted else set()
 
-    # Prepare image using median threshold
-    bin_img = median_adapt(image)
+    results = {}
+    for name, future in futures.items():
+        if future is None:
+            continue
+        if future in done:
+            results[name] = future.result()
+        elif future.cancel():
+            # still queued behind a straggler: drop it instead of letting the queue grow
+            _line_futures.pop(name, None)
+
+    methods = [name for name in futures if name in results]
+    mosaic_data = results.get("mosaic")
+    line_results = results.get("contour")
+
+    if line_results is None:
+        if mosaic_data is None:
+            mosaic_data = [(idx, None, None) for idx in range(num_slices)]
+        # nothing to confirm the mosaic points against: they all stay unconfirmed
+        return {
+            "mosaic": mosaic_data,
+            "contour_slices": {},
+            "skeleton_slices": {},
+            "confirm_with": (),
+            "methods": methods,
+            "stale": not methods
+        }
 
-    # Run contour/skeleton detection
-    line_results = detect_line_methods(bin_img, image)
+    confirm_with = ("contour_slices", "skeleton_slices")
+    if mosaic_data is None:
+        mosaic_data = _mosaic_from_line_results(line_results, ctx.shape[1])
+        confirm_with = ("contour_slices",)
 
     return {
         "mosaic": mosaic_data,
         "contour_slices": line_results["contour_slices"],
-        "skeleton_slices": line_results["skeleton_slices"]
+        "skeleton_slices": line_results["skeleton_slices"],
+        "confirm_with": confirm_with,
+        "methods": methods,
+        "stale": False
     }
 
 
-
 import math
 from typing import List, Tuple, Optional
 
@@ -589,6 +929,52 @@ def new_classify_direction(confirmed_results):
 
 
 
+def _direction_key(cmd):
+    # direction tuples hold a list of speeds, which is not hashable
+    if cmd is None:
+        return None
+    return (cmd[0], cmd[1], cmd[2], tuple(cmd[3]))
+
+
+class DirectionFilter:
+    """
+    Temporal smoothing for new_classify_direction: majority vote over a ring buffer
+    of the last `window` decisions, with hysteresis. update() returns a command only
+    when a different direction wins at least `min_votes` of the window.
+
+    Otherwise update() returns None and nothing new should be sent: the callers
+    (TEST_LINE.py, LINE_FOLLOWER.py) call process_command only for a non-None result
+    and never re-send a command, so the robot is left on the last command it received.
+    None is returned when:
+      - the majority of the window is None (no line seen): the filter never issues a
+        stop, no command is sent until a direction wins again;
+      - no direction reaches `min_votes`;
+      - two directions tie for the majority (no switch on a tie);
+      - the winner is the current command.
+    """
+
+    def __init__(self, window=5, min_votes=3):
+        self.history = deque(maxlen=window)
+        self.min_votes = min_votes
+        self.current = None
+
+    def update(self, cmd):
+        self.history.append(cmd)
+        ranked = Counter(_direction_key(c) for c in self.history).most_common(2)
+        key, votes = ranked[0]
+        if len(ranked) > 1 and ranked[1][1] == votes:
+            return None
+        if key is None or votes < self.min_votes or key == _direction_key(self.current):
+            return None
+        self.current = next(c for c in reversed(self.history) if _direction_key(c) == key)
+        return self.current
+
+    def reset(self):
+        self.history.clear()
+        self.current = None
+
+
+
 
 
 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Replays slice_log.txt (written by TEST_LINE_PROCESS.py) through the direction
+classifiers, without the robot.
+
+Each log line is:
+    <timestamp> | [(slice_idx, deviation, (x, y), confirmed), ...] | <label>
+where <label> is the direction the operator saw (D1front, D4left, ...).
+
+Reports the accuracy of new_classify_direction and of the legacy
+classify_direction against the same logged labels (side by side), the legacy
+output distribution, and per-call latency. Legacy outputs without a command in
+LEGACY_TO_DIRECTION are not scored; they are counted as unmapped.
+
+Usage:
+    python SOURCES/LINE_PROCESS/slice_log_replay.py [slice_log.txt] [--repeat N]
+"""
+
+import os
+import sys
+import ast
+import time
+import argparse
+from collections import Counter, defaultdict
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from LINE_PROCESS.get_line import (
+    directions,
+    new_classify_direction,
+    get_direction_from_confirmed_results,
+)
+
+# Logged label -> entry of `directions` that new_classify_direction should return
+LABEL_TO_DIRECTION = {
+    "D1front": directions[7],
+    "D3right": directions[0],
+    "D10right": directions[1],
+    "D17right": directions[2],
+    "D4left": directions[3],
+    "D9left": directions[4],
+    "D15left": directions[5],
+}
+
+# Legacy classify_direction output -> entry of `directions`, only where the command table in
+# get_line.py names the same movement: [7] "front", [0] "front right", [1] "side right",
+# [2] "diagonala right". The left-hand commands (3-5) are not named there, so LEFT,
+# FRONT LEFT, DIAGONAL FRONT LEFT, the back bins and UNKNOWN have no command: records
+# where the legacy classifier returns them are left out of its score ("legacy_unmapped").
+LEGACY_TO_DIRECTION = {
+    "FRONT": directions[7],
+    "FRONT RIGHT": directions[0],
+    "RIGHT": directions[1],
+    "DIAGONAL FRONT RIGHT": directions[2],
+}
+
+DEFAULT_LOG = os.path.abspath(os.path.join(parent_dir, "..", "slice_log.txt"))
+
+
+def direction_label(cmd):
+    """Inverse of LABEL_TO_DIRECTION; unknown commands (e.g. rotate) get their index."""
+    for label, direction in LABEL_TO_DIRECTION.items():
+        if cmd == direction:
+            return label
+    if cmd in directions:
+        return f"directions[{directions.index(cmd)}]"
+    return str(cmd)
+
+
+def parse_slice_log(path):
+    """Returns a list of (timestamp, confirmed_results, label); malformed lines are skipped."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                timestamp, slices, label = (part.strip() for part in line.split("|"))
+                confirmed = ast.literal_eval(slices)
+            except (ValueError, SyntaxError):
+                print(f"Skipping malformed line {line_no}: {line[:60]}")
+                continue
+            records.append((timestamp, confirmed, label))
+    return records
+
+
+def _time_calls(fn, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(arg)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def _latency_summary(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    to_us = 1e6
+    return (f"mean {sum(samples) / n * to_us:.1f} us | p50 {samples[n // 2] * to_us:.1f} us | "
+            f"p95 {samples[min(n - 1, int(n * 0.95))] * to_us:.1f} us | max {samples[-1] * to_us:.1f} us")
+
+
+def replay(records, repeat=100):
+    """
+    Runs both classifiers on every record.
+
+    Returns:
+        {
+            "total", "labelled", "correct": counts for new_classify_direction,
+            "legacy_correct", "legacy_scored": correct/scored counts for classify_direction
+                (via LEGACY_TO_DIRECTION); "legacy_unmapped" = labelled - legacy_scored,
+            "per_label": {label: [new_correct, total, legacy_correct, legacy_scored]},
+            "mismatches": [(timestamp, expected, got)],
+            "legacy": Counter of classify_direction outputs,
+            "new_latency", "legacy_latency": per-record seconds per call
+        }
+    """
+    report = {
+        "total": len(records),
+        "labelled": 0,
+        "correct": 0,
+        "legacy_correct": 0,
+        "legacy_scored": 0,
+        "legacy_unmapped": 0,
+        "per_label": defaultdict(lambda: [0, 0, 0, 0]),
+        "mismatches": [],
+        "legacy": Counter(),
+        "new_latency": [],
+        "legacy_latency": [],
+    }
+    for timestamp, confirmed, label in records:
+        cmd, dt_new = _time_calls(new_classify_direction, confirmed, repeat)
+        legacy, dt_legacy = _time_calls(get_direction_from_confirmed_results, confirmed, repeat)
+        report["new_latency"].append(dt_new)
+        report["legacy_latency"].append(dt_legacy)
+        report["legacy"][legacy] += 1
+
+        expected = LABEL_TO_DIRECTION.get(label)
+        if expected is None:
+            continue
+        report["labelled"] += 1
+        report["per_label"][label][1] += 1
+        legacy_cmd = LEGACY_TO_DIRECTION.get(legacy)
+        if legacy_cmd is None:
+            report["legacy_unmapped"] += 1
+        else:
+            report["legacy_scored"] += 1
+            report["per_label"][label][3] += 1
+            if legacy_cmd == expected:
+                report["legacy_correct"] += 1
+                report["per_label"][label][2] += 1
+        if cmd == expected:
+            report["correct"] += 1
+            report["per_label"][label][0] += 1
+        else:
+            report["mismatches"].append((timestamp, label, direction_label(cmd)))
+    return report
+
+
+def print_report(report):
+    labelled = report["labelled"]
+
+    def cell(k, n):
+        return f"{k:>3}/{n:<3} {k / n * 100 if n else 0.0:5.1f}%"
+
+    def row(name, ok, n, legacy_ok, legacy_n):
+        print(f"  {name:<9} {cell(ok, n):<24} {cell(legacy_ok, legacy_n)}")
+
+    print(f"Records: {report['total']} (labelled: {labelled}, "
+          f"legacy output without a command: {report['legacy_unmapped']})")
+    print(f"  {'accuracy':<9} {'new_classify_direction':<24} classify_direction (mapped only)")
+    row("all", report["correct"], labelled, report["legacy_correct"], report["legacy_scored"])
+    for label in LABEL_TO_DIRECTION:
+        if label in report["per_label"]:
+            row(label, *report["per_label"][label])
+    if report["mismatches"]:
+        print("Mismatches:")
+        for timestamp, expected, got in report["mismatches"]:
+            print(f"  {timestamp}  expected {expected:<9} got {got}")
+    print("classify_direction outputs:", dict(report["legacy"]))
+    if report["new_latency"]:
+        print("new_classify_direction latency:", _latency_summary(report["new_latency"]))
+        print("classify_direction latency:    ", _latency_summary(report["legacy_latency"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay slice_log.txt through the direction classifiers.")
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG)
+    parser.add_argument("--repeat", type=int, default=100, help="calls per record for latency timing")
+    args = parser.parse_args()
+
+    print_report(replay(parse_slice_log(args.log), repeat=args.repeat))
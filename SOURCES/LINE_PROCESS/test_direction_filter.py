@@ -0,0 +1,54 @@
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from LINE_PROCESS.get_line import DirectionFilter, directions
+
+FRONT = directions[7]
+RIGHT = directions[0]
+LEFT = directions[3]
+
+
+def test_stable_direction_is_issued_once():
+    f = DirectionFilter(window=5, min_votes=3)
+    assert [f.update(FRONT) for _ in range(5)] == [None, None, FRONT, None, None]
+
+
+def test_all_none_window_keeps_last_command():
+    f = DirectionFilter(window=5, min_votes=3)
+    for _ in range(3):
+        f.update(RIGHT)
+    assert f.current == RIGHT
+    # line lost: None wins the window, but no new command (and no stop) is issued
+    assert [f.update(None) for _ in range(5)] == [None] * 5
+    assert f.current == RIGHT
+    # the previous direction coming back is not re-sent
+    assert [f.update(RIGHT) for _ in range(5)] == [None] * 5
+
+
+def test_all_none_from_start_issues_nothing():
+    f = DirectionFilter(window=5, min_votes=3)
+    assert [f.update(None) for _ in range(8)] == [None] * 8
+    assert f.current is None
+
+
+def test_tied_window_does_not_switch():
+    f = DirectionFilter(window=4, min_votes=2)
+    f.update(FRONT)
+    assert f.update(FRONT) == FRONT
+    # window [FRONT, FRONT, LEFT, LEFT]: tie, keep FRONT
+    assert f.update(LEFT) is None
+    assert f.update(LEFT) is None
+    assert f.current == FRONT
+    # window [FRONT, LEFT, LEFT, LEFT]: LEFT wins
+    assert f.update(LEFT) == LEFT
+
+
+def test_tie_against_none_does_not_switch():
+    f = DirectionFilter(window=4, min_votes=2)
+    for cmd in (None, None, RIGHT, RIGHT):
+        assert f.update(cmd) is None
+    assert f.current is None
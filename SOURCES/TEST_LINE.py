@@ -5,6 +5,7 @@ from LINE_PROCESS.get_line import (
     confirm_analyzed_points,
     get_direction_from_confirmed_results,
     new_classify_direction,
+    DirectionFilter,
 )
 
 from USART_COM.serial_module import process_command
@@ -13,15 +14,20 @@ from USART_COM.serial_module import process_command
 
 def main_loop(num_slices=8, image_width=512):
     init_camera()
+    direction_filter = DirectionFilter(window=5, min_votes=3)
     try:
         while True:
             frame = capture_raw_image()
             if frame is None:
                 continue
 
-            data = extract_dual_data(frame.copy(), num_slices=num_slices)
-            confirmed = confirm_analyzed_points(data)
-            CMD = new_classify_direction(confirmed)
+            data = extract_dual_data(frame, num_slices=num_slices)
+            if data["stale"]:
+                # no line method finished for this frame: not a lost line, just no new vote
+                CMD = None
+            else:
+                confirmed = confirm_analyzed_points(data)
+                CMD = direction_filter.update(new_classify_direction(confirmed))
 
 
             if CMD:
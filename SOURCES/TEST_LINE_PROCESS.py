@@ -49,8 +49,9 @@ class App:
 
     def update_loop(self):
         frame = self.cam.frame
-        if frame is not None:
-            data = extract_dual_data(frame.copy(), num_slices=self.num_slices)
+        data = extract_dual_data(frame.copy(), num_slices=self.num_slices) if frame is not None else None
+        # a stale frame (no line method finished in time) is neither shown nor saved to the log
+        if data is not None and not data["stale"]:
             confirmed = confirm_analyzed_points(data)
             new_direction=new_classify_direction(confirmed)
             direction=get_direction_from_confirmed_results(confirmed)
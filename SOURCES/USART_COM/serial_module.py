@@ -16,8 +16,17 @@ except Exception as e:
     print("Eroare la deschiderea portului serial:", e)
     raise
 
+# Id-ul ultimului pachet trimis; crește la fiecare comandă, deci un id neschimbat
+# înseamnă că robotul nu a primit nicio comandă de mișcare între timp (vezi get_zone.ZoneCache).
+last_command_id = 0
+
+
+def get_last_command_id():
+    return last_command_id
+
 
 def send(cmd_type, val1, val2, vector):
+    global last_command_id
     # Deschide portul serial (verifică ce port este activ pe sistemul tău)
 
 
@@ -35,6 +44,7 @@ def send(cmd_type, val1, val2, vector):
     packet.append(0xBB)  # Marker de sfârșit
 
     ser.write(packet)
+    last_command_id += 1
     print("Pachet trimis:", list(packet))
 
 
@@ -11,11 +11,11 @@ Descriere: Acest modul importă funcționalitățile din UTILS.MAP și ZONE_DETE
 """
 
 import tkinter as tk
-import random
-import math
+import warnings
+from functools import lru_cache
 
-# Importăm funcțiile din UTILS.MAP
-from .MAP import process_boxes, classify_box_relative,  analyze_virtual_box
+import cv2
+import numpy as np
 
 import os
 import sys
@@ -26,7 +26,10 @@ if parent_dir not in sys.path:
     
 # Importăm funcția de detectare a zonei din ZONE_DETECT.get_zone
 # Această versiune modificată de detect_zone returnează acum și poligonul (lista de puncte hull)
-from ZONE_DETECT.get_zone import detect_zone
+from ZONE_DETECT.get_zone import detect_zone, point_in_poly, points_in_poly
+# Importăm funcțiile din UTILS.MAP (aceeași cale ca map_render, ca modulul să fie încărcat o singură dată)
+from UTILS.MAP import (process_boxes, classify_box_relative, classify_positions, analyze_virtual_boxes,
+                       zone_template, ZONE_SAFE)
 
 
 def is_position_free(candidate_box, boxes, ignore_box_id=None):
@@ -58,124 +61,223 @@ def is_position_free(candidate_box, boxes, ignore_box_id=None):
     return True
 
 
+def free_positions_mask(candidates, boxes, ignore_box_id=None):
+    """
+    Varianta în lot a is_position_free pentru M poziții candidat (array (M, 2) în cm, cutii 3x3 la unghi 0).
+    analyze_virtual_boxes dă clasificarea cutiilor relativ la fiecare candidat; direcția inversă
+    și fereastra de ±3 cm se verifică pe aceleași perechi (M, N).
+    Returnează un array bool (M,): True unde is_position_free ar accepta poziția.
+    """
+    candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+    ids, _, safe_flags, _ = analyze_virtual_boxes(candidates, boxes, exclude_box_id=ignore_box_id)
+    positions = np.array([boxes[bid]["real_position"] for bid in ids], dtype=np.float64).reshape(-1, 2)
+    too_close = np.all(np.abs(candidates[:, None, :] - positions[None, :, :]) < 3, axis=2).any(axis=1)
+    reverse_safe = np.all(classify_positions(candidates[:, None, :], positions[None, :, :]) == ZONE_SAFE, axis=1)
+    return (safe_flags == 1) & reverse_safe & ~too_close
+
+
 
-def find_free_position(boxes, zone_limits, max_boxes_allowed, 
-                       min_spacing_x=7, min_spacing_y=6, 
-                       min_boundary=3, 
-                       grid_min_spacing_x=6, grid_min_spacing_y=5,
-                       max_attempts=1000, ignore_box_id=None):
+# Rezoluția grilei de ocupare (cm); pozițiile cutiilor sunt rotunjite la 0.5 cm
+FREE_GRID_CM = 0.5
+# Offseturile (|dx|, |dy| în cm) acoperite de șablonul de blocare; fereastra hărților de debug
+STENCIL_EXTENT_CM = (50.0, 40.0)
+# Câte poziții libere (cele mai bune) se returnează pentru debug
+FREE_CANDIDATES_REPORTED = 20
+# Câte celule din clasament se verifică deodată cu free_positions_mask
+FREE_VERIFY_BATCH = 64
+
+
+def blocked_offsets(cell=FREE_GRID_CM, extent=STENCIL_EXTENT_CM):
     """
-    Algoritm extins pentru determinarea poziției libere (ca și înainte),
-    dar care acum colectează în lista free_candidates toate pozițiile candidate
-    care au fost verificate ca fiind "free".
-    
+    Șablonul offseturilor d = candidat - cutie pentru care is_position_free respinge candidatul
+    (fereastra ±3 cm sau o clasificare diferită de "Safe" în oricare direcție).
+    Clasificarea depinde doar de diferența pozițiilor, deci șablonul se calculează o singură dată.
+    Rândul 0 corespunde lui dy = +extent_y (y scade în jos), coloana 0 lui dx = -extent_x.
+    """
+    return _blocked_offsets(float(cell), (float(extent[0]), float(extent[1])))
+
+
+@lru_cache(maxsize=4)
+def _blocked_offsets(cell, extent):
+    nx = int(round(extent[0] / cell))
+    ny = int(round(extent[1] / cell))
+    rr, cc = np.mgrid[0:2 * ny + 1, 0:2 * nx + 1]
+    offsets = np.dstack(((cc - nx) * cell, (ny - rr) * cell))
+    # target în offset = cutia existentă văzută de la -offset; lookup evaluează exact offseturile din afara rasterului
+    template = zone_template()
+    blocked = ((np.abs(offsets[..., 0]) < 3) & (np.abs(offsets[..., 1]) < 3) |
+               (template.lookup(-offsets) != ZONE_SAFE) |
+               (template.lookup(offsets) != ZONE_SAFE))
+    blocked.flags.writeable = False
+    return blocked
+
+
+def build_occupancy_grid(boxes, zone_limits, hull=None, min_boundary=3, ignore_box_id=None, cell=FREE_GRID_CM):
+    """
+    Rasterizează zona (hull-ul, sau dreptunghiul zone_limits) într-o grilă de ocupare cu pasul 'cell'
+    și ștampilează în ea șablonul blocked_offsets() al fiecărei cutii.
+
+    Returnează un dicționar:
+      - "free": masca bool a celulelor unde o cutie nouă ar fi liberă și la cel puțin min_boundary de marginea zonei,
+      - "clearance": distanța (cm) de la fiecare celulă liberă la cea mai apropiată celulă ocupată/în afara zonei,
+      - "x0", "y_top", "cell": celula (r, c) are centrul în (x0 + c*cell, y_top - r*cell).
+    """
+    left, right = zone_limits["left"], zone_limits["right"]
+    bottom, top = zone_limits["bottom"], zone_limits["top"]
+    if right <= left or top <= bottom or left == 999:
+        return None
+
+    # o celulă de margine în jurul zonei, ca distanceTransform să măsoare până la marginea ei
+    x0 = left - cell
+    y_top = top + cell
+    cols = int(round((right - left) / cell)) + 3
+    rows = int(round((top - bottom) / cell)) + 3
+    rr, cc = np.mgrid[0:rows, 0:cols]
+    xs = x0 + cc * cell
+    ys = y_top - rr * cell
+
+    in_zone = (xs >= left) & (xs <= right) & (ys >= bottom) & (ys <= top)
+    if hull and len(hull) >= 3:
+        in_zone &= points_in_poly(np.column_stack((xs.ravel(), ys.ravel())), hull,
+                                  include_boundary=True).reshape(rows, cols)
+    to_edge = cv2.distanceTransform(in_zone.astype(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    # distanța până la prima celulă din afara zonei include și acea celulă
+    free = in_zone & ((to_edge - 1) * cell >= min_boundary - 1e-9)
+
+    stencil = blocked_offsets(cell)
+    ny, nx = stencil.shape[0] // 2, stencil.shape[1] // 2
+    blocked = np.zeros((rows, cols), dtype=bool)
+    for bid, box in boxes.items():
+        if ignore_box_id is not None and bid == ignore_box_id:
+            continue
+        bx, by = box["real_position"]
+        c_b = int(round((bx - x0) / cell))
+        r_b = int(round((y_top - by) / cell))
+        r0, r1 = max(0, r_b - ny), min(rows, r_b + ny + 1)
+        c0, c1 = max(0, c_b - nx), min(cols, c_b + nx + 1)
+        if r0 >= r1 or c0 >= c1:
+            continue
+        blocked[r0:r1, c0:c1] |= stencil[r0 - r_b + ny:r1 - r_b + ny, c0 - c_b + nx:c1 - c_b + nx]
+    free &= ~blocked
+
+    clearance = cv2.distanceTransform(free.astype(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE) * cell
+    return {"free": free, "clearance": clearance, "x0": x0, "y_top": y_top, "cell": cell}
+
+
+def count_boxes_in_zone(boxes, zone_limits, hull=None, ignore_box_id=None):
+    """Numărul cutiilor din zonă (în hull, ca pos_flags din detect_zone, sau în dreptunghiul zone_limits)."""
+    positions = [box["real_position"] for bid, box in boxes.items() if bid != ignore_box_id]
+    if not positions:
+        return 0
+    if hull and len(hull) >= 3:
+        return int(np.count_nonzero(points_in_poly(positions, hull)))
+    return sum(1 for x, y in positions
+               if zone_limits["left"] <= x <= zone_limits["right"] and
+               zone_limits["bottom"] <= y <= zone_limits["top"])
+
+
+def find_free_position(boxes, zone_limits, max_boxes_allowed,
+                       min_spacing_x=None, min_spacing_y=None,
+                       min_boundary=3,
+                       grid_min_spacing_x=None, grid_min_spacing_y=None,
+                       max_attempts=None, ignore_box_id=None,
+                       hull=None, preferred=None, maximize_clearance=False, max_verified=1000):
+    """
+    Determină poziția liberă dintr-o singură trecere pe grila de ocupare (build_occupancy_grid):
+      - implicit, celula liberă cea mai apropiată de punctul preferat (la egalitate, cea cu spațiul
+        liber cel mai mare); dacă preferred nu este dat, se folosește ca înainte începutul rândului
+        cutiilor existente din zonă (stânga, y predominant) sau colțul stânga-sus al zonei goale,
+      - cu maximize_clearance=True, celula cu distanța maximă față de cutii și marginea zonei.
+    Primele max_verified celule din clasament sunt verificate exact, în loturi de FREE_VERIFY_BATCH,
+    cu free_positions_mask (is_position_free vectorizat), până când una trece.
+    Dacă zona are deja max_boxes_allowed cutii (fără ignore_box_id), nu se caută nimic.
+
+    Parametrii vechii căutări sunt acceptați (aceeași ordine pozițională), dar sunt depreciați
+    și nu au efect, cu un DeprecationWarning dacă sunt dați: min_spacing_x/y și
+    grid_min_spacing_x/y (pasul rețelei de candidați; grila de ocupare acoperă toată zona)
+    și max_attempts (numărul de încercări aleatorii; căutarea nu mai are fază aleatorie).
+
     La final se întoarce un tuple: (candidate_position, free_candidates, error_details)
     unde candidate_position este poziția finală (sau None),
-    free_candidates este lista tuturor pozițiilor libere verificate (pentru debug),
+    free_candidates este lista celor mai bune poziții libere din grilă (pentru debug),
     iar error_details este None dacă s-a găsit cel puțin una.
     """
-    error_details = []
-    free_candidates = []
-    
-    # Calculăm dimensiunile zonei
-    zone_width = zone_limits["right"] - zone_limits["left"]
-    zone_height = zone_limits["top"] - zone_limits["bottom"]
-    
-    # Filtrăm cutiile care se află în zona (după coordonate)
+    deprecated = {"min_spacing_x": min_spacing_x, "min_spacing_y": min_spacing_y,
+                  "grid_min_spacing_x": grid_min_spacing_x, "grid_min_spacing_y": grid_min_spacing_y,
+                  "max_attempts": max_attempts}
+    given = [name for name, value in deprecated.items() if value is not None]
+    if given:
+        warnings.warn(f"find_free_position: parametri depreciați, fără efect pe grila de ocupare: {', '.join(given)}",
+                      DeprecationWarning, stacklevel=2)
+
+    grid = build_occupancy_grid(boxes, zone_limits, hull=hull, min_boundary=min_boundary,
+                                ignore_box_id=ignore_box_id)
+    if grid is None:
+        return None, [], ["Zona nu a fost detectată."]
+    if count_boxes_in_zone(boxes, zone_limits, hull=hull, ignore_box_id=ignore_box_id) >= max_boxes_allowed:
+        return None, [], [f"Zona are deja {max_boxes_allowed} cutii (max_boxes_allowed)."]
+
+    rows, cols = np.nonzero(grid["free"])
+    if len(rows) == 0:
+        return None, [], ["Nu există nicio celulă liberă în grila de ocupare a zonei."]
+    xs = grid["x0"] + cols * grid["cell"]
+    ys = grid["y_top"] - rows * grid["cell"]
+    clearance = grid["clearance"][rows, cols]
+
+    if maximize_clearance:
+        order = np.lexsort((xs, -ys, -clearance))
+    else:
+        if preferred is None:
+            preferred = _default_preferred_point(boxes, zone_limits, min_boundary)
+        dist = np.hypot(xs - preferred[0], ys - preferred[1])
+        order = np.lexsort((xs, -ys, -clearance, dist))
+
+    free_candidates = [(float(xs[i]), float(ys[i])) for i in order[:FREE_CANDIDATES_REPORTED]]
+    attempts = order[:max_verified]
+    for start in range(0, len(attempts), FREE_VERIFY_BATCH):
+        batch = attempts[start:start + FREE_VERIFY_BATCH]
+        passed = np.flatnonzero(free_positions_mask(np.column_stack((xs[batch], ys[batch])), boxes,
+                                                    ignore_box_id=ignore_box_id))
+        if len(passed):
+            i = batch[passed[0]]
+            return (float(xs[i]), float(ys[i])), free_candidates, None
+    return None, free_candidates, [f"Niciuna din primele {max_verified} celule libere nu a trecut verificarea exactă."]
+
+
+def _default_preferred_point(boxes, zone_limits, min_boundary):
+    """Punctul de start al vechii căutări pe grilă: rândul predominant al cutiilor din zonă sau stânga-sus."""
     def in_zone(pos):
         x, y = pos
         return (zone_limits["left"] <= x <= zone_limits["right"] and
                 zone_limits["bottom"] <= y <= zone_limits["top"])
-    boxes_in_zone = {bid: box for bid, box in boxes.items() if in_zone(box["real_position"])}
-    
-    candidate_positions = []
-    
-    if boxes_in_zone:
-        # --- Cazul în care există cutii în zonă ---
-        y_values = [box["real_position"][1] for box in boxes_in_zone.values()]
-        clusters = {}
-        for y in y_values:
-            key = round(y)  # grupare pe unitate
-            clusters.setdefault(key, []).append(y)
-        predominant_key = max(clusters, key=lambda k: len(clusters[k]))
-        avg_y = sum(clusters[predominant_key]) / len(clusters[predominant_key])
-        
-        x_start = zone_limits["left"] + min_boundary
-        x_end = zone_limits["right"] - min_boundary
-        num_candidates = int(math.floor((x_end - x_start) / min_spacing_x)) + 1
-        for i in range(num_candidates):
-            candidate_x = x_start + i * min_spacing_x
-            candidate_positions.append((candidate_x, avg_y))
-    else:
-        # --- Cazul în care nu există cutii în zonă ---
-        spacing_x = min_spacing_x
-        spacing_y = min_spacing_y
-        x_start = zone_limits["left"] + min_boundary
-        x_end = zone_limits["right"] - min_boundary
-        y_start = zone_limits["bottom"] + min_boundary
-        y_end = zone_limits["top"] - min_boundary
-        
-        def grid_positions(sp_x, sp_y):
-            xs = []
-            pos = x_start
-            while pos <= x_end:
-                xs.append(pos)
-                pos += sp_x
-            ys = []
-            pos = y_end  # pornim de sus
-            while pos >= y_start:
-                ys.append(pos)
-                pos -= sp_y
-            grid = []
-            for y in ys:
-                for x in xs:
-                    grid.append((x, y))
-            return grid
-        
-        grid_candidates = grid_positions(spacing_x, spacing_y)
-        if len(grid_candidates) > max_boxes_allowed + 3:
-            factor = 1 + (len(grid_candidates) - (max_boxes_allowed + 3)) / len(grid_candidates)
-            spacing_x = min(spacing_x * factor, spacing_x * 2)
-            spacing_y = min(spacing_y * factor, spacing_y * 2)
-            grid_candidates = grid_positions(spacing_x, spacing_y)
-        candidate_positions.extend(grid_candidates)
-    
-    candidate_positions.sort(key=lambda pos: (-pos[1], pos[0]))
-    
-    # Verificăm candidații predefiniți
-    chosen_candidate = None
-    for candidate in candidate_positions:
-        candidate_box = {"real_position": candidate, "real_size": (3, 3), "angle": 0}
-        if is_position_free(candidate_box, boxes, ignore_box_id=ignore_box_id):
-            free_candidates.append(candidate)
-            # Prima poziție free din listă o considerăm candidate
-            if chosen_candidate is None:
-                chosen_candidate = candidate
-    if chosen_candidate is not None:
-        return chosen_candidate, free_candidates, None
-    error_details.append("Candidații predefiniți nu au fost liberi.")
-    
-    # Dacă nu am găsit în sondajul structurat, căutare aleatorie
-    for _ in range(max_attempts):
-        candidate_x = random.uniform(zone_limits["left"] + min_boundary, zone_limits["right"] - min_boundary)
-        candidate_y = random.uniform(zone_limits["bottom"] + min_boundary, zone_limits["top"] - min_boundary)
-        candidate = (candidate_x, candidate_y)
-        candidate_box = {"real_position": candidate, "real_size": (3, 3), "angle": 0}
-        if is_position_free(candidate_box, boxes, ignore_box_id=ignore_box_id):
-            free_candidates.append(candidate)
-            return candidate, free_candidates, None
-    error_details.append(f"Căutarea aleatorie (max_attempts={max_attempts}) nu a găsit un loc liber.")
-    return None, free_candidates, error_details
+    y_values = [box["real_position"][1] for box in boxes.values() if in_zone(box["real_position"])]
+    x_pref = zone_limits["left"] + min_boundary
+    if not y_values:
+        return x_pref, zone_limits["top"] - min_boundary
+    clusters = {}
+    for y in y_values:
+        clusters.setdefault(round(y), []).append(y)  # grupare pe unitate
+    predominant = max(clusters.values(), key=len)
+    return x_pref, sum(predominant) / len(predominant)
 
 
-def analyze_zone_and_find_spot(image_copy, session, max_boxes, ignore_box_id, debug=False):
+def analyze_zone_and_find_spot(image_copy, session, max_boxes, ignore_box_id, debug=False, motion_id=None,
+                               render_log=None):
+    """
+    motion_id: id-ul ultimei comenzi de mișcare trimise (serial_module.get_last_command_id());
+    cât timp nu se schimbă și imaginea e practic aceeași, detect_zone refolosește zona calculată anterior.
+    render_log: opțional un map_render.RenderLogger; harta (ca în debug_interface) se loghează fără Tkinter,
+    la rata de decimare a loggerului; map_render se importă doar atunci.
+    """
+    if render_log is not None:
+        from UTILS.map_render import render_map
 
 
     print(session)
     processed_boxes = process_boxes(session)
     print(processed_boxes)
     positions = [box["real_position"] for box in processed_boxes.values()]
-    zone_limits, pos_flags, hull = detect_zone(image_copy, positions=positions, debug=False)
+    zone_limits, pos_flags, hull = detect_zone(image_copy, positions=positions, debug=False, motion_id=motion_id)
     count_in_zone = sum(pos_flags)
     if debug:
         print("Limitele zonei:", zone_limits)
@@ -183,12 +285,18 @@ def analyze_zone_and_find_spot(image_copy, session, max_boxes, ignore_box_id, de
         print("Număr cutii în zonă:", count_in_zone)
     
     if count_in_zone >= max_boxes:
+        if render_log is not None:
+            render_log.log("free_spot", render_map, processed_boxes, zone_limits=zone_limits, hull=hull)
         if debug:
             print("Zona este FULL.")
             debug_interface(processed_boxes, zone_limits, hull, candidate_spot=None, free_candidates=[])
         return "FULL"
     
-    free_spot, free_candidates, errors = find_free_position(processed_boxes, zone_limits, max_boxes, ignore_box_id=ignore_box_id)
+    free_spot, free_candidates, errors = find_free_position(processed_boxes, zone_limits, max_boxes,
+                                                            ignore_box_id=ignore_box_id, hull=hull)
+    if render_log is not None:
+        render_log.log("free_spot", render_map, processed_boxes, zone_limits=zone_limits, hull=hull,
+                       candidate_spot=free_spot, free_candidates=free_candidates)
     if debug:
         if free_spot:
             print("Poziție liberă găsită:", free_spot)
@@ -221,24 +329,6 @@ def debug_interface(boxes, zone_limits, hull, candidate_spot=None, free_candidat
         cy = (max_y - y) * scale
         return cx, cy
 
-    def point_in_poly(x, y, poly):
-        inside = False
-        n = len(poly)
-        if n == 0:
-            return False
-        p1x, p1y = poly[0]
-        for i in range(1, n+1):
-            p2x, p2y = poly[i % n]
-            if min(p1y, p2y) < y <= max(p1y, p2y):
-                if p1y != p2y:
-                    xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                else:
-                    xinters = p1x
-                if x <= xinters:
-                    inside = not inside
-            p1x, p1y = p2x, p2y
-        return inside
-
     min_x, max_x = -25, 25
     min_y, max_y = -10, 30
     scale = 10
@@ -30,24 +30,24 @@ Descriere: Primește un dicționar cu informații despre cutii (culoare, literă
              - "target_specified_in_session": 1 dacă targetul a fost furnizat și găsit, 0 altfel.
 """
 
+import os
+import sys
 import tkinter as tk
 import random
 import math
 
+import numpy as np
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from UTILS.calibration import px_to_cm
+
 # --- Funcții de conversie ---
 def round_to_half(value):
     """Rotunjește valoarea la cel mai apropiat 0.5 cm."""
     return round(value * 2) / 2
-
-def get_real_y(detected_y):
-    return 0.05587 * detected_y - 4.47
-
-def get_center_x(detected_y):
-	
-    return 0.0203 * detected_y + 230.38
-
-def get_scale_x(detected_y):
-    return 0.0000608 * detected_y + 0.046936
     
     
 def get_effective_margin(box):
@@ -65,32 +65,8 @@ def get_effective_margin(box):
 
 
 def getRealCoordinates(detected_x, detected_y):
-
-
-    # Dimensiunile imaginii
-    width, height = 512, 512
-    
-    # Conversia coordonatelor pentru rotația de 180°:
-    # Noua coordonată x este (width - 1) - detected_x
-    # Noua coordonată y este (height - 1) - detected_y
-    rotated_x = (width - 1) - detected_x
-    rotated_y = (height - 1) - detected_y
-
-    # Folosim coordonatele rotite pentru a calcula coordonatele reale
-    center_x = get_center_x(rotated_y)
-    scale_x = get_scale_x(rotated_y)
-    
-    # Calculul real_x: diferența de la centru, scalată
-    real_x = (rotated_x - center_x) * scale_x  
-    
-    # Calculul real_y, se presupune că get_real_y primește valoarea rotită a lui y
-    real_y = get_real_y(rotated_y)
-    
-    # Rotunjire la cel mai apropiat 0.5
-    real_x = round_to_half(real_x)
-    real_y = round_to_half(real_y)
-    
-    return real_x, real_y
+    real_x, real_y = px_to_cm([(detected_x, detected_y)])[0]
+    return float(real_x), float(real_y)
 
 
 
@@ -104,9 +80,10 @@ def process_boxes(session_dict):
     Dacă culoarea este "sample", se folosește "beige".
     """
     processed_boxes = {}
-    for box_id, box in session_dict.items():
-        detected_x, detected_y = box["position"]
-        real_x, real_y = getRealCoordinates(detected_x, detected_y)
+    items = list(session_dict.items())
+    # toate pozițiile convertite într-un singur apel
+    real_positions = px_to_cm([box["position"] for _, box in items]).tolist()
+    for (box_id, box), (real_x, real_y) in zip(items, real_positions):
         if box.get("size"):
             width_px, height_px = box["size"]
             width_cm = round_to_half(width_px / PIXELS_PER_CM)
@@ -146,6 +123,11 @@ class BoxMapApp:
         self.selected_box_id = None
         self.nearby_box_ids = []
 
+        # Elementele de canvas create o singură dată și actualizate la fiecare draw_map
+        self.box_items = {}   # box_id -> (id dreptunghi, id text)
+        self.box_state = {}   # box_id -> ultima stare desenată (coordonate, culoare, literă)
+        self.selected_item = None
+
         # Setăm sistemul de coordonate fix:
         self.min_x = -25
         self.max_x = 25
@@ -241,37 +223,62 @@ class BoxMapApp:
             self.canvas.create_text(cx-20, cy, text=f"{y} cm", font=("Arial", 8))
 
     def draw_map(self):
-        self.canvas.delete("all")
-        self.draw_grid()
-        self.draw_axes()
+        """
+        Actualizează harta incremental: gridul și axele sunt desenate o singură dată (în __init__),
+        cutiile păstrează aceleași elemente de canvas și se modifică doar coordonatele / culorile
+        celor care s-au schimbat. Zonele și marcajele de click se șterg, ca la redesenarea completă.
+        """
+        self.canvas.delete("zone", "click", "nearby")
+        for box_id in [bid for bid in self.box_items if bid not in self.boxes]:
+            self.canvas.delete(*self.box_items.pop(box_id))
+            self.box_state.pop(box_id, None)
         for box_id, box in self.boxes.items():
             x, y = box["real_position"]
             size_px = get_box_draw_size(box, scale=self.scale)
             half_px = size_px / 2
             cx, cy = self.real_to_canvas(x, y)
+            state = (cx, cy, half_px, box["color"], box["letter"])
+            if self.box_state.get(box_id) == state:
+                continue
             left_c = cx - half_px
             top_c = cy - half_px
             right_c = cx + half_px
             bottom_c = cy + half_px
             fill_color = box["color"]
-            self.canvas.create_rectangle(left_c, top_c, right_c, bottom_c,
-                                         fill=fill_color, outline="black", width=2, tags=box_id)
-            self.canvas.create_text(cx, cy, text=box["letter"], fill="white", font=("Arial", 12))
-        if self.selected_box_id:
+            if box_id not in self.box_items:
+                rect_id = self.canvas.create_rectangle(left_c, top_c, right_c, bottom_c,
+                                                       fill=fill_color, outline="black", width=2, tags=box_id)
+                text_id = self.canvas.create_text(cx, cy, text=box["letter"], fill="white", font=("Arial", 12))
+                self.box_items[box_id] = (rect_id, text_id)
+            else:
+                rect_id, text_id = self.box_items[box_id]
+                self.canvas.coords(rect_id, left_c, top_c, right_c, bottom_c)
+                self.canvas.itemconfig(rect_id, fill=fill_color)
+                self.canvas.coords(text_id, cx, cy)
+                self.canvas.itemconfig(text_id, text=box["letter"])
+            self.box_state[box_id] = state
+        if self.selected_box_id and self.selected_box_id in self.boxes:
             sel_box = self.boxes[self.selected_box_id]
             bx, by = sel_box["real_position"]
             cx, cy = self.real_to_canvas(bx, by)
             size_px = get_box_draw_size(sel_box, scale=self.scale)
             half_px = size_px / 2
-            self.canvas.create_rectangle(cx - half_px - 3, cy - half_px - 3,
-                                         cx + half_px + 3, cy + half_px + 3,
-                                         outline="blue", width=3, dash=(4,2), tags="selected")
+            coords = (cx - half_px - 3, cy - half_px - 3, cx + half_px + 3, cy + half_px + 3)
+            if self.selected_item is None:
+                self.selected_item = self.canvas.create_rectangle(*coords, outline="blue", width=3,
+                                                                  dash=(4,2), tags="selected")
+            else:
+                self.canvas.coords(self.selected_item, *coords)
+                self.canvas.itemconfig(self.selected_item, state="normal")
+                self.canvas.tag_raise(self.selected_item)
+        elif self.selected_item is not None:
+            self.canvas.itemconfig(self.selected_item, state="hidden")
         # Desenăm opțional indicatori pentru cutiile din nearby
         for nb in self.nearby_box_ids:
             if nb in self.boxes:
                 bx, by = self.boxes[nb]["real_position"]
                 cx, cy = self.real_to_canvas(bx, by)
-                self.canvas.create_oval(cx-5, cy-5, cx+5, cy+5, outline="magenta", width=2)
+                self.canvas.create_oval(cx-5, cy-5, cx+5, cy+5, outline="magenta", width=2, tags="nearby")
 
     def update_map(self, new_boxes):
         self.boxes = new_boxes
@@ -316,7 +323,7 @@ class BoxMapApp:
         cx, cy = event.x, event.y
         rx, ry = self.canvas_to_real(cx, cy)
         print(f"Canvas click at ({cx}, {cy}) => Real coordinates: ({rx:.2f} cm, {ry:.2f} cm)")
-        self.canvas.create_text(cx, cy, text=f"({rx:.1f}, {ry:.1f})", fill="blue", font=("Arial", 8))
+        self.canvas.create_text(cx, cy, text=f"({rx:.1f}, {ry:.1f})", fill="blue", font=("Arial", 8), tags="click")
 
     def draw_zone(self, x_left, x_right, y_bottom, y_top, fill_color, stipple, tag):
         p_top_left = self.real_to_canvas(x_left, y_top)
@@ -522,69 +529,223 @@ def classify_box_relative(other, target):
     Funcție de clasificare similară cu metoda classify_box, dar la nivel de modul.
     Prioritatea: Danger > Proximity > Warning > Safe.
     Returnează "Danger", "Proximity", "Warning" sau "Safe" pentru cutia 'other' relativ la cutia 'target'.
+    Zonele sunt cele din ZONE_RULES; offseturile aliniate la grila ZoneTemplate se citesc direct din
+    rasterul precompilat, restul se evaluează exact cu classify_positions.
     """
     x, y = other["real_position"]
     bx, by = target["real_position"]
+    code = zone_template().label(x - bx, y - by)
+    if code is None:
+        code = int(classify_positions((x, y), (bx, by)))
+    return ZONE_NAMES[code]
+
+# Codurile clasificării vectorizate; ZONE_NAMES[cod] dă eticheta întoarsă de classify_box_relative
+ZONE_SAFE, ZONE_WARNING, ZONE_PROXIMITY, ZONE_DANGER = 0, 1, 2, 3
+ZONE_NAMES = ("Safe", "Warning", "Proximity", "Danger")
+
+# Zonele relative la target, ca date: (cod, dreptunghiuri (x0, x1, y0, y1) relative la poziția targetului,
+# prag pe suprapunerea verticală a cutiei 'other' cu dreptunghiul, prag strict).
+# Suprapunerea verticală contează doar dacă există și suprapunere orizontală; se ia maximul pe dreptunghiuri.
+# Regulile sunt în ordinea priorității; o zonă nouă se adaugă aici, fără alt cod.
+ZONE_BOX_HALF = 1.5  # cutiile sunt considerate 3x3 cm
+ZONE_RULES = (
+    # Danger A (tot ce e sub banda din față) și Danger B (banda din fața targetului)
+    (ZONE_DANGER, ((-10.5, 10.5, -np.inf, -7), (-5, 5, -7, -1.5)), 0.6, False),
+    # Proximity: benzile laterale, orice intersecție
+    (ZONE_PROXIMITY, ((-3.6, -1.5, -1.5, 2), (1.5, 3.6, -1.5, 2)), 0.0, True),
+    # Warning: prelungirile laterale ale benzii din față
+    (ZONE_WARNING, ((-10.5, -5, -7, -1.5), (5, 10.5, -7, -1.5)), 1.0, False),
+)
+
+def classify_positions(other_xy, target_xy, rules=ZONE_RULES):
+    """
+    Varianta vectorizată a classify_box_relative: 'other_xy' și 'target_xy' sunt array-uri (..., 2)
+    de poziții reale, combinate prin broadcasting. Regulile din ZONE_RULES se evaluează cu aceleași
+    operații ca vechile condiții scrise de mână; returnează codurile ZONE_* (int8).
+    """
+    o = np.asarray(other_xy, dtype=np.float64)
+    t = np.asarray(target_xy, dtype=np.float64)
+    x, y = o[..., 0], o[..., 1]
+    bx, by = t[..., 0], t[..., 1]
+
+    left = x - ZONE_BOX_HALF
+    right = x + ZONE_BOX_HALF
+    top = y + ZONE_BOX_HALF
+    bottom = y - ZONE_BOX_HALF
+
+    codes = np.full(np.broadcast(x, bx).shape, ZONE_SAFE, dtype=np.int8)
+    # de la prioritatea cea mai mică la cea mai mare, ca zonele prioritare să suprascrie
+    for code, rects, threshold, strict in reversed(rules):
+        overlap = 0.0
+        for x0, x1, y0, y1 in rects:
+            horiz_overlap = np.minimum(right, bx + x1) - np.maximum(left, bx + x0)
+            vert_overlap = np.maximum(0, np.minimum(top, by + y1) - np.maximum(bottom, by + y0))
+            overlap = np.maximum(overlap, np.where(horiz_overlap > 0, vert_overlap, 0.0))
+        hit = overlap > threshold if strict else overlap >= threshold
+        codes[hit] = code
+    return codes
+
+# Rasterul ZoneTemplate: pasul 0.25 cm conține grila de 0.5 cm a pozițiilor și nu cade pe nicio margine
+# de zonă (±3.6 etc.). Toate zonele sunt mărginite la |dx| < 12 și dy < 3.5, iar sub dy = -8.5 clasificarea
+# nu mai depinde de dy, deci offseturile din afara ferestrei se pot fixa pe marginea ei.
+ZONE_TEMPLATE_CELL = 0.25
+ZONE_TEMPLATE_EXTENT = (16.0, 16.0)
+
+class ZoneTemplate:
+    """
+    Regulile ZONE_RULES precompilate într-un raster de etichete în jurul targetului:
+    labels[r, c] este clasificarea pentru offsetul (dx, dy) = other - target, cu
+    dx = -extent_x + c * cell și dy = extent_y - r * cell.
+    """
+    def __init__(self, rules=ZONE_RULES, cell=ZONE_TEMPLATE_CELL, extent=ZONE_TEMPLATE_EXTENT):
+        self.rules = rules
+        self.cell = float(cell)
+        self.extent = (float(extent[0]), float(extent[1]))
+        self.cols = int(round(2 * self.extent[0] / self.cell)) + 1
+        self.rows = int(round(2 * self.extent[1] / self.cell)) + 1
+        rr, cc = np.mgrid[0:self.rows, 0:self.cols]
+        offsets = np.dstack((cc * self.cell - self.extent[0], self.extent[1] - rr * self.cell))
+        self.labels = classify_positions(offsets, np.zeros(2), rules)
+        self.labels.flags.writeable = False
+
+    def label(self, dx, dy):
+        """Codul pentru un offset scalar, sau None dacă offsetul nu este pe grila rasterului."""
+        c = float(dx + self.extent[0]) / self.cell
+        r = float(self.extent[1] - dy) / self.cell
+        if not (c.is_integer() and r.is_integer()):
+            return None
+        c = min(max(int(c), 0), self.cols - 1)
+        r = min(max(int(r), 0), self.rows - 1)
+        return self.labels.item(r, c)
+
+    def lookup(self, offsets):
+        """Codurile pentru un array (..., 2) de offseturi; cele din afara grilei se evaluează exact."""
+        offsets = np.asarray(offsets, dtype=np.float64)
+        c = (offsets[..., 0] + self.extent[0]) / self.cell
+        r = (self.extent[1] - offsets[..., 1]) / self.cell
+        on_grid = (c == np.floor(c)) & (r == np.floor(r))
+        ci = np.clip(np.where(on_grid, c, 0), 0, self.cols - 1).astype(np.int64)
+        ri = np.clip(np.where(on_grid, r, 0), 0, self.rows - 1).astype(np.int64)
+        codes = self.labels[ri, ci]
+        if not on_grid.all():
+            codes = np.where(on_grid, codes, classify_positions(offsets, np.zeros(2), self.rules))
+        return codes
+
+_zone_template = None
+
+def zone_template():
+    """Rasterul partajat al regulilor ZONE_RULES, construit la prima utilizare."""
+    global _zone_template
+    if _zone_template is None:
+        _zone_template = ZoneTemplate()
+    return _zone_template
+
+# Latura celulei hash-ului spațial (cm); de ordinul lățimii zonelor relative, ca o interogare să atingă puține celule
+SPATIAL_HASH_CELL_CM = 6.0
+
+class SpatialHash:
+    """
+    Grilă uniformă (hash) peste pozițiile reale ale cutiilor unei sesiuni, construită o singură dată.
+    Interogările returnează indici în ordinea sesiunii (ids[i], positions[i]), deci rezultatele
+    funcțiilor de analiză păstrează ordinea iterării peste sesiune.
+    Funcțiile de analiză primesc hash-ul prin parametrul 'index'; cine face mai multe analize pe
+    aceeași sesiune îl construiește o dată (SpatialHash(session)) și îl transmite. Hash-ul nu urmărește
+    modificările sesiunii: după schimbarea cutiilor se construiește unul nou.
+    """
+    def __init__(self, boxes, cell=SPATIAL_HASH_CELL_CM):
+        self.cell = float(cell)
+        self.ids = list(boxes.keys())
+        self.positions = np.array([boxes[box_id]["real_position"] for box_id in self.ids],
+                                  dtype=np.float64).reshape(-1, 2)
+        self.buckets = {}
+        if len(self.ids):
+            cells = np.floor(self.positions / self.cell).astype(np.int64)
+            for i, (cx, cy) in enumerate(cells.tolist()):
+                self.buckets.setdefault((cx, cy), []).append(i)
+            self.buckets = {k: np.array(v, dtype=np.int64) for k, v in self.buckets.items()}
+            self.cell_min = cells.min(axis=0).tolist()
+            self.cell_max = cells.max(axis=0).tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell_range(self, lo, hi, axis):
+        """Intervalul de celule ocupate pe o axă care acoperă [lo, hi]; limitele pot fi infinite."""
+        first = self.cell_min[axis] if lo == -np.inf else max(int(np.floor(lo / self.cell)), self.cell_min[axis])
+        last = self.cell_max[axis] if hi == np.inf else min(int(np.floor(hi / self.cell)), self.cell_max[axis])
+        return first, last
+
+    def query_rect(self, x0, x1, y0, y1):
+        """Indicii (crescători) cutiilor cu poziția în dreptunghiul închis [x0, x1] x [y0, y1]."""
+        if not len(self.ids) or x0 > x1 or y0 > y1:
+            return np.empty(0, dtype=np.int64)
+        c0, c1 = self._cell_range(x0, x1, 0)
+        r0, r1 = self._cell_range(y0, y1, 1)
+        hits = []
+        if (c1 - c0 + 1) * (r1 - r0 + 1) > len(self.buckets):
+            hits = [idx for (cx, cy), idx in self.buckets.items() if c0 <= cx <= c1 and r0 <= cy <= r1]
+        else:
+            for cx in range(c0, c1 + 1):
+                for cy in range(r0, r1 + 1):
+                    idx = self.buckets.get((cx, cy))
+                    if idx is not None:
+                        hits.append(idx)
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        idx = np.concatenate(hits)
+        x, y = self.positions[idx, 0], self.positions[idx, 1]
+        idx = idx[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+        idx.sort()
+        return idx
+
+    def query_radius(self, x, y, radius):
+        """Indicii (crescători) cutiilor aflate la cel mult 'radius' cm de (x, y)."""
+        idx = self.query_rect(x - radius, x + radius, y - radius, y + radius)
+        d = self.positions[idx] - (x, y)
+        return idx[np.einsum("ij,ij->i", d, d) <= radius * radius]
+
+    def query_zones(self, target_xy, rules=ZONE_RULES):
+        """
+        Cutiile care pot cădea în zonele din 'rules' relativ la o poziție target: dreptunghiurile
+        regulilor, lărgite cu ZONE_BOX_HALF, interogate separat. Returnează (indici, coduri ZONE_*),
+        doar pentru cutiile care nu sunt Safe, în ordinea sesiunii.
+        """
+        bx, by = float(target_xy[0]), float(target_xy[1])
+        parts = [self.query_rect(bx + x0 - ZONE_BOX_HALF, bx + x1 + ZONE_BOX_HALF,
+                                 by + y0 - ZONE_BOX_HALF, by + y1 + ZONE_BOX_HALF)
+                 for _, rects, _, _ in rules for x0, x1, y0, y1 in rects]
+        idx = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        codes = classify_positions(self.positions[idx], (bx, by), rules)
+        keep = codes != ZONE_SAFE
+        return idx[keep], codes[keep]
+
+def session_index(session, index=None):
+    """Hash-ul spațial dat de apelant pentru 'session', sau unul nou dacă nu a fost dat."""
+    return SpatialHash(session) if index is None else index
+
+def _zone_lists(session, index, target_xy, skip_id=None):
+    """(danger_list, proximity_list, warning_list) pentru cutiile din jurul unei poziții target."""
+    lists = {ZONE_DANGER: [], ZONE_PROXIMITY: [], ZONE_WARNING: []}
+    idx, codes = index.query_zones(target_xy)
+    for i, code in zip(idx.tolist(), codes.tolist()):
+        box_id = index.ids[i]
+        if box_id == skip_id:
+            continue
+        box = session[box_id]
+        lists[code].append((box_id, box.get("color"), box.get("letter")))
+    return lists[ZONE_DANGER], lists[ZONE_PROXIMITY], lists[ZONE_WARNING]
 
-    left = x - 1.5
-    right = x + 1.5
-    top = y + 1.5
-    bottom = y - 1.5
-
-
-    # Calcul Danger
-    danger_A = 0.0
-    if right > (bx - 10.5) and left < (bx + 10.5):
-        if bottom < (by - 7):
-            danger_A = min(top, by - 7) - bottom
-
-    danger_B = 0.0
-    horiz_overlap_B = max(0, min(right, bx + 5) - max(left, bx - 5))
-    if horiz_overlap_B > 0:
-        vertical_overlap_B = max(0, min(top, by - 1.5) - max(bottom, by - 7))
-        danger_B = vertical_overlap_B
-
-    danger_overlap = max(danger_A, danger_B)
-    if danger_overlap >= 0.6:
-        return "Danger"
-
-    # Verificare zonă Proximity
-    prox_bottom = by - 1.5
-    prox_top = by + 2
-    prox_left_left = bx - 3.6
-    prox_left_right = bx - 1.5
-    prox_right_left = bx + 1.5
-    prox_right_right = bx + 3.6
-
-    def intersects(zone_left, zone_right, zone_bottom, zone_top, rect_left, rect_right, rect_bottom, rect_top):
-        horiz_overlap = min(zone_right, rect_right) - max(zone_left, rect_left)
-        vert_overlap = min(zone_top, rect_top) - max(zone_bottom, rect_bottom)
-        return horiz_overlap > 0 and vert_overlap > 0
-
-
-    in_proximity = (intersects(prox_left_left, prox_left_right, prox_bottom, prox_top, left, right, bottom, top) or
-                    intersects(prox_right_left, prox_right_right, prox_bottom, prox_top, left, right, bottom, top))
-    if in_proximity:
-        return "Proximity"
-
-    # Calcul Warning
-    warning_left = 0.0
-    horiz_overlap_left = max(0, min(right, bx - 5) - max(left, bx - 10.5))
-    if horiz_overlap_left > 0:
-        vertical_overlap_left = max(0, min(top, by - 1.5) - max(bottom, by - 7))
-        warning_left = vertical_overlap_left
-
-    warning_right = 0.0
-    horiz_overlap_right = max(0, min(right, bx + 10.5) - max(left, bx + 5))
-    if horiz_overlap_right > 0:
-        vertical_overlap_right = max(0, min(top, by - 1.5) - max(bottom, by - 7))
-        warning_right = vertical_overlap_right
-
-    warning_overlap = max(warning_left, warning_right)
-    if warning_overlap >= 1.0:
-        return "Warning"
-
-    return "Safe"
+def classify_box_matrix(boxes):
+    """
+    Clasificarea tuturor perechilor de cutii dintr-un singur apel.
+    Returnează (ids, positions, codes): codes[i, j] este clasificarea cutiei ids[i] relativ
+    la targetul ids[j]; diagonala (cutia față de ea însăși) este ZONE_SAFE.
+    """
+    ids = list(boxes.keys())
+    positions = np.array([boxes[i]["real_position"] for i in ids], dtype=np.float64).reshape(-1, 2)
+    codes = classify_positions(positions[:, None, :], positions[None, :, :])
+    np.fill_diagonal(codes, ZONE_SAFE)
+    return ids, positions, codes
 
 def select_best_candidate(boxes):
     """
@@ -592,35 +753,38 @@ def select_best_candidate(boxes):
     Dacă există cutii care, analizate ca target, NU au vecini în zona Danger, se alege cea mai apropiată de centru (0,0).
     Dacă nu, se alege cutia cu cel mai mic număr de vecini Danger (și, în caz de egalitate, cea mai apropiată de centru).
     Returnează un tuple (candidate_id, candidate_box).
+    Alegerea reproduce exact bucla originală în ordinea sesiunii: o cutie fără vecini Danger
+    înlocuiește candidatul curent doar dacă este strict mai aproape de centru, iar după ea
+    nicio cutie cu vecini Danger nu o mai poate înlocui.
     """
-    best_candidate_id = None
-    best_candidate = None
-    best_danger_count = float('inf')
-    best_dist = float('inf')
-    for box_id, box in boxes.items():
-        danger_count = 0
-        for other_id, other in boxes.items():
-            if other_id == box_id:
-                continue
-            if classify_box_relative(other, box) == "Danger":
-                danger_count += 1
-        x, y = box["real_position"]
-        d = math.sqrt(x*x + y*y)
-        if danger_count == 0:
-            if d < best_dist:
-                best_candidate_id = box_id
-                best_candidate = box
-                best_dist = d
-                best_danger_count = 0
-        else:
-            if best_candidate is None or best_danger_count > danger_count or (best_danger_count == danger_count and d < best_dist):
-                best_candidate_id = box_id
-                best_candidate = box
-                best_danger_count = danger_count
-                best_dist = d
-    return best_candidate_id, best_candidate
-
-def analyze_target_zones(session, target_box_id=None):
+    if not boxes:
+        return None, None
+    ids, positions, codes = classify_box_matrix(boxes)
+    danger_count = np.count_nonzero(codes == ZONE_DANGER, axis=0)
+    x, y = positions[:, 0], positions[:, 1]
+    dist = np.sqrt(x * x + y * y)
+    n = len(ids)
+    zero = danger_count == 0
+
+    # candidatul buclei înainte de prima cutie fără Danger acceptată: minimul (danger, dist) al cutiilor
+    # cu Danger văzute până atunci (prima apariție la egalitate), ca rang în ordinea lexsort; n = niciunul
+    order = np.lexsort((dist, danger_count))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    prefix = np.minimum.accumulate(np.where(zero, n, rank))
+    before = np.concatenate(([n], prefix[:-1]))
+    dist_by_rank = np.append(dist[order], np.inf)
+    accepted = zero & (dist < dist_by_rank[before])
+    if not accepted.any():
+        best = order[prefix[-1]]
+    else:
+        # de la prima cutie fără Danger acceptată, doar cutiile fără Danger strict mai apropiate o înlocuiesc
+        first = int(np.argmax(accepted))
+        later = np.flatnonzero(zero[first:]) + first
+        best = later[np.argmin(dist[later])]
+    return ids[best], boxes[ids[best]]
+
+def analyze_target_zones(session, target_box_id=None, index=None):
     """
     Analizează zona în jurul unei cutii target din sesiune.
     
@@ -628,6 +792,7 @@ def analyze_target_zones(session, target_box_id=None):
       - session: dicționarul de sesiune cu cutii procesate (formatul este cel generat de process_boxes)
       - target_box_id: (opțional) ID-ul cutiei target. Dacă nu este furnizat sau nu se găsește,
           se returnează safe_flag = 1 și liste goale.
+      - index: (opțional) SpatialHash(session) construit o dată de apelant pentru mai multe analize.
     
     Returnează un tuple format din:
       - safe_flag: 1 dacă nici o cutie nu se găsește în zonele Danger, Proximity sau Warning (adică targetul este considerat safe),
@@ -643,25 +808,14 @@ def analyze_target_zones(session, target_box_id=None):
         return 1, [], [], []
     
     candidate = session[target_box_id]
-    danger_list = []
-    proximity_list = []
-    warning_list = []
-    
-    for box_id, box in session.items():
-        if box_id == target_box_id:
-            continue
-        classification = classify_box_relative(box, candidate)
-        if classification == "Danger":
-            danger_list.append((box_id, box.get("color"), box.get("letter")))
-        elif classification == "Proximity":
-            proximity_list.append((box_id, box.get("color"), box.get("letter")))
-        elif classification == "Warning":
-            warning_list.append((box_id, box.get("color"), box.get("letter")))
+    # Doar cutiile din vecinătatea zonelor, prin hash-ul spațial al sesiunii
+    danger_list, proximity_list, warning_list = _zone_lists(
+        session, session_index(session, index), candidate["real_position"], skip_id=target_box_id)
     
     safe_flag = 1 if not danger_list and not proximity_list and not warning_list else 0
     return safe_flag, danger_list, proximity_list, warning_list
 
-def analyze_session_boxes(session, target_box_id=None, mandatory=False):
+def analyze_session_boxes(session, target_box_id=None, mandatory=False, index=None):
     """
     Analizează sesiunea de cutii și returnează o listă de ID-uri ordonată crescător după diferența verticală față de target,
     împreună cu trei flaguri explicative:
@@ -671,6 +825,7 @@ def analyze_session_boxes(session, target_box_id=None, mandatory=False):
     
     Dacă target_box_id nu este furnizat sau nu se găsește în sesiune, se alege cea mai apropiată de centru care nu are vecini în Danger.
     Dacă mandatory este True, targetul este inclus în listă chiar dacă nu este clasificat ca non-safe.
+    index: (opțional) SpatialHash(session) construit o dată de apelant pentru mai multe analize.
     """
     
 
@@ -683,15 +838,19 @@ def analyze_session_boxes(session, target_box_id=None, mandatory=False):
 
     danger_count = 0
     neighbors = []
-    for box_id, box in session.items():
+    index = session_index(session, index)
+    if target_box is not None:
+        idx, codes = index.query_zones(target_box["real_position"])
+    else:
+        idx, codes = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+    for i, cls in zip(idx.tolist(), codes.tolist()):
+        box_id = index.ids[i]
         if box_id == target_box_id:
             continue
-        cls = classify_box_relative(box, target_box)
-        if cls == "Danger":
+        if cls == ZONE_DANGER:
             danger_count += 1
-        if cls in ["Danger", "Proximity", "Warning"]:
-            diff = abs(box["real_position"][1] - target_box["real_position"][1])
-            neighbors.append((box_id, diff))
+        diff = abs(session[box_id]["real_position"][1] - target_box["real_position"][1])
+        neighbors.append((box_id, diff))
     neighbors.sort(key=lambda x: x[1])
     neighbor_ids = [nid for nid, _ in neighbors]
     target_in_first = 0
@@ -711,13 +870,14 @@ def analyze_session_boxes(session, target_box_id=None, mandatory=False):
     
     
 
-def analyze_virtual_box(virtual_position, session, ghost_size=(3, 3), ghost_angle=0):
+def analyze_virtual_box(virtual_position, session, ghost_size=(3, 3), ghost_angle=0, index=None):
     """
     Primește:
       - virtual_position: un tuple (x, y) în centimetri,
       - session: dicționarul de cutii procesate (unde fiecare cutie are cel puțin cheile "real_position", "real_size" și "angle"),
       - ghost_size (opțional): dimensiunea virtuală a cutiei (default (3, 3) cm),
       - ghost_angle (opțional): unghiul cutiei virtuale (default 0).
+      - index (opțional): SpatialHash(session) construit o dată de apelant, ex. pentru mai multe poziții virtuale.
       
     Creează o cutie virtuală (ghost box) la poziția dată și analizează cutiile din sesiune relativ la aceasta,
     folosind funcția de clasificare (classify_box_relative).
@@ -738,22 +898,36 @@ def analyze_virtual_box(virtual_position, session, ghost_size=(3, 3), ghost_angl
         "letter": ""
     }
     
-    danger_list = []
-    proximity_list = []
-    warning_list = []
-    
-    # Iterează peste toate cutiile din sesiune și le clasifică relativ la ghost_box
-    for box_id, box in session.items():
-        classification = classify_box_relative(box, ghost_box)
-        if classification == "Danger":
-            danger_list.append((box_id, box.get("color"), box.get("letter")))
-        elif classification == "Proximity":
-            proximity_list.append((box_id, box.get("color"), box.get("letter")))
-        elif classification == "Warning":
-            warning_list.append((box_id, box.get("color"), box.get("letter")))
+    # Clasifică relativ la ghost_box doar cutiile din vecinătatea zonelor (hash-ul spațial al sesiunii)
+    danger_list, proximity_list, warning_list = _zone_lists(
+        session, session_index(session, index), ghost_box["real_position"])
     
     safe_flag = 1 if not danger_list and not proximity_list and not warning_list else 0
     return safe_flag, danger_list, proximity_list, warning_list
+
+# Ponderile scorului unei plasări virtuale, indexate cu codul ZONE_* (Safe, Warning, Proximity, Danger)
+VIRTUAL_SCORE_WEIGHTS = np.array([0.0, 1.0, 10.0, 100.0])
+
+def analyze_virtual_boxes(virtual_positions, session, exclude_box_id=None):
+    """
+    Varianta în lot a analyze_virtual_box: evaluează M poziții virtuale (array (M, 2) în cm)
+    față de toate cutiile sesiunii într-o singură trecere vectorizată.
+    exclude_box_id: cutia ignorată (ex. cutia care urmează să fie mutată).
+    
+    Returnează un tuple format din:
+      - ids: lista ID-urilor cutiilor din sesiune (coloanele lui codes),
+      - codes: array (M, N) cu clasificarea (ZONE_*) fiecărei cutii relativ la fiecare poziție virtuală,
+      - safe_flags: array (M,) cu 1 dacă poziția nu are nicio cutie în Danger, Proximity sau Warning,
+      - scores: array (M,) cu suma ponderilor VIRTUAL_SCORE_WEIGHTS; 0 = Safe, mai mic = mai bun.
+    Rândul i al lui codes conține exact clasificările făcute de analyze_virtual_box(virtual_positions[i], session).
+    """
+    candidates = np.asarray(virtual_positions, dtype=np.float64).reshape(-1, 2)
+    ids = [box_id for box_id in session if box_id != exclude_box_id]
+    positions = np.array([session[box_id]["real_position"] for box_id in ids], dtype=np.float64).reshape(-1, 2)
+    codes = classify_positions(positions[None, :, :], candidates[:, None, :])
+    scores = VIRTUAL_SCORE_WEIGHTS[codes].sum(axis=1)
+    safe_flags = np.all(codes == ZONE_SAFE, axis=1).astype(np.int64)
+    return ids, codes, safe_flags, scores
     
     
     
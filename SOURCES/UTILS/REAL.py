@@ -3,46 +3,21 @@
 Module: real_coordinate_converter
 Descriere: Funcții de conversie a coordonatelor detectate (x, y) din imagine în coordonate reale (cm),
            bazate pe o calibrare (exemplificată cu datele colectate) și generarea instrucțiunilor de deplasare.
+           Formulele de calibrare se află în UTILS.calibration.
 """
 
-def round_to_half(value):
-    """Rotunjește valoarea la cel mai apropiat 0.5 cm."""
-    return round(value * 2) / 2
+import os
+import sys
 
-# Funcții de conversie pentru axa Y
-def get_real_y(detected_y):
-    """
-    Conversia pentru axa y.
-    Pe baza datelor calibrate:
-      - detected_y = 80  => real_y ≈ 0
-      - detected_y = 474 => real_y ≈ 22.0
-    Formula aleasă:
-      real_y = 0.05587 * detected_y - 4.47
-    """
-    return 0.05587 * detected_y - 4.47
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-# Funcții de conversie pentru axa X
-def get_center_x(detected_y):
-    """
-    Calculează coordonata de centru (pentru slotul central, unde real_x = 0)
-    Pe baza datelor calibrate:
-      - detected_y = 80  => center_x ≈ 232
-      - detected_y = 474 => center_x ≈ 240
-    Formula aleasă:
-      center_x = 0.0203 * detected_y + 230.38
-    """
-    return 0.0203 * detected_y + 230.38
+from UTILS.calibration import px_to_cm
 
-def get_scale_x(detected_y):
-    """
-    Factorul de scalare pentru transformarea abaterii față de centru în real_x.
-    Se calculează pe baza datelor calibrate:
-      - La low y: scale_x ≈ 10 / 193 ≈ 0.0518
-      - La high y: scale_x ≈ 10 / 132 ≈ 0.0758
-    Formula aleasă:
-      scale_x = 0.0000608 * detected_y + 0.046936
-    """
-    return 0.0000608 * detected_y + 0.046936
+def round_to_half(value):
+    """Rotunjește valoarea la cel mai apropiat 0.5 cm."""
+    return round(value * 2) / 2
 
 def getRealCoordinates(detected_x, detected_y):
     """
@@ -58,30 +33,8 @@ def getRealCoordinates(detected_x, detected_y):
       
     Presupunem că imaginea originală este de 512x512 pixeli.
     """
-    # Dimensiunile imaginii
-    width, height = 512, 512
-    
-    # Conversia coordonatelor pentru rotația de 180°:
-    # Noua coordonată x este (width - 1) - detected_x
-    # Noua coordonată y este (height - 1) - detected_y
-    rotated_x = (width - 1) - detected_x
-    rotated_y = (height - 1) - detected_y
-
-    # Folosim coordonatele rotite pentru a calcula coordonatele reale
-    center_x = get_center_x(rotated_y)
-    scale_x = get_scale_x(rotated_y)
-    
-    # Calculul real_x: diferența de la centru, scalată
-    real_x = (rotated_x - center_x) * scale_x  
-    
-    # Calculul real_y, se presupune că get_real_y primește valoarea rotită a lui y
-    real_y = get_real_y(rotated_y)
-    
-    # Rotunjire la cel mai apropiat 0.5
-    real_x = round_to_half(real_x)
-    real_y = round_to_half(real_y)
-    
-    return real_x, real_y
+    real_x, real_y = px_to_cm([(detected_x, detected_y)])[0]
+    return float(real_x), float(real_y)
 
 
 def getMovementInstructions(detected_x, detected_y):
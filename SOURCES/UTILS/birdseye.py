@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Modul: birdseye.py
+Descriere: Rectificarea imaginii camerei într-o vedere de sus (bird's-eye) a podelei, la o scară fixă cm/pixel.
+  - Hărțile cv2.remap se construiesc o singură dată din calibrarea activă (UTILS.calibration.cm_to_px_model)
+    și se reconstruiesc doar dacă modelul de calibrare se schimbă.
+  - În imaginea rectificată coloanele cresc cu x (cm) și rândurile scad cu y (cm), ca pe hărțile de debug
+    (MAP / GET_FREE), deci măștile de zonă, căutarea de loc liber și amprentele cutiilor se pot calcula
+    direct în coordonate de podea, cu operații obișnuite pe imagini.
+  - rectify_frame() memorează rezultatul în FrameContext, deci mai mulți consumatori ai aceluiași cadru
+    plătesc o singură rectificare.
+  - Consumator: ZONE_DETECT.get_zone clusterizează celulele zonei pe vederea de sus
+    (cluster_cells_birdseye) când ZONE_USE_BIRDSEYE = True sau compute_zone(..., birdseye=True).
+
+Utilizare exemplu:
+    from UTILS.birdseye import get_default_view, rectify_frame
+
+    view = get_default_view()
+    top = rectify_frame(ctx)                   # imagine (view.height, view.width, 3)
+    rc = view.cm_to_grid([(0.0, 10.0)])        # (col, row) în imaginea rectificată
+    zone = view.polygon_mask(hull)             # masca poligonului (cm) în aceeași grilă
+
+Rulare standalone:
+    python birdseye.py [imagine.png] [iesire.png]
+"""
+
+import os
+import sys
+import cv2
+import numpy as np
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from CAMERA.frame_context import as_frame_context
+from UTILS.calibration import CM_X_RANGE, CM_Y_RANGE, cm_to_px_model, get_model
+
+BIRDSEYE_CM_PER_PX = 0.25
+
+
+class BirdseyeView:
+    """
+    Grila de podea [x_range] x [y_range] (cm) eșantionată la cm_per_px.
+    Pixelul (col, row) al imaginii rectificate corespunde punctului
+    (x_range[0] + col * cm_per_px, y_range[1] - row * cm_per_px) cm.
+    """
+    def __init__(self, cm_per_px=BIRDSEYE_CM_PER_PX, x_range=CM_X_RANGE, y_range=CM_Y_RANGE):
+        self.cm_per_px = float(cm_per_px)
+        self.x_range = (float(x_range[0]), float(x_range[1]))
+        self.y_range = (float(y_range[0]), float(y_range[1]))
+        self.width = int(round((self.x_range[1] - self.x_range[0]) / self.cm_per_px)) + 1
+        self.height = int(round((self.y_range[1] - self.y_range[0]) / self.cm_per_px)) + 1
+        self._maps = None
+        self._maps_model = None
+
+    @property
+    def key(self):
+        return ("birdseye", self.cm_per_px, self.x_range, self.y_range)
+
+    @property
+    def shape(self):
+        return self.height, self.width
+
+    def cm_to_grid(self, points):
+        """(N, 2) cm -> (N, 2) float (col, row) în imaginea rectificată."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cols = (pts[:, 0] - self.x_range[0]) / self.cm_per_px
+        rows = (self.y_range[1] - pts[:, 1]) / self.cm_per_px
+        return np.column_stack((cols, rows))
+
+    def grid_to_cm(self, points):
+        """(N, 2) (col, row) -> (N, 2) cm."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        xs = self.x_range[0] + pts[:, 0] * self.cm_per_px
+        ys = self.y_range[1] - pts[:, 1] * self.cm_per_px
+        return np.column_stack((xs, ys))
+
+    def maps(self):
+        """
+        Hărțile cv2.remap (format fix CV_16SC2, cel mai rapid) pentru calibrarea activă.
+        Se calculează o dată: pentru fiecare pixel al grilei, pixelul sursă prin cm_to_px_model.
+        """
+        model = get_model()
+        if self._maps is None or self._maps_model is not model:
+            rows, cols = np.mgrid[0:self.height, 0:self.width].astype(np.float64)
+            xs = self.x_range[0] + cols * self.cm_per_px
+            ys = self.y_range[1] - rows * self.cm_per_px
+            src_x, src_y = cm_to_px_model(xs, ys)
+            self._maps = cv2.convertMaps(src_x.astype(np.float32), src_y.astype(np.float32), cv2.CV_16SC2)
+            self._maps_model = model
+        return self._maps
+
+    def rectify(self, image, interpolation=cv2.INTER_LINEAR):
+        """Imaginea de podea văzută de sus; zonele din afara câmpului camerei rămân negre."""
+        map1, map2 = self.maps()
+        return cv2.remap(image, map1, map2, interpolation,
+                         borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    def valid_mask(self, image_shape=(512, 512)):
+        """Masca (uint8, 255) pixelilor grilei care se află în câmpul camerei."""
+        ones = np.full(image_shape[:2], 255, dtype=np.uint8)
+        return self.rectify(ones, interpolation=cv2.INTER_NEAREST)
+
+    def polygon_mask(self, poly_cm, value=255, mask=None):
+        """Rasterizează un poligon dat în cm (ex. hull-ul zonei) în grila rectificată."""
+        if mask is None:
+            mask = np.zeros(self.shape, dtype=np.uint8)
+        if len(poly_cm) >= 3:
+            pts = np.round(self.cm_to_grid(poly_cm)).astype(np.int32)
+            cv2.fillPoly(mask, [pts], value)
+        return mask
+
+
+_default_view = None
+
+def get_default_view():
+    """Vederea partajată (BIRDSEYE_CM_PER_PX, fereastra hărților de debug); hărțile se construiesc o singură dată."""
+    global _default_view
+    if _default_view is None:
+        _default_view = BirdseyeView()
+    return _default_view
+
+def rectify_frame(frame, view=None, interpolation=cv2.INTER_LINEAR):
+    """Rectifică un cadru (np.ndarray sau FrameContext); rezultatul este memorat în FrameContext."""
+    view = view or get_default_view()
+    ctx = as_frame_context(frame)
+    return ctx.derive(view.key + (interpolation,), lambda: view.rectify(ctx.image, interpolation))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        raw = cv2.imread(sys.argv[1])
+    else:
+        from CAMERA.camera_session import capture_raw_image
+        raw = capture_raw_image()
+    top = rectify_frame(raw)
+    out = sys.argv[2] if len(sys.argv) > 2 else "birdseye.png"
+    cv2.imwrite(out, top)
+    print(f"Vedere de sus {top.shape[1]}x{top.shape[0]} ({BIRDSEYE_CM_PER_PX} cm/px) scrisă în {out}")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Modul: calibration.py
+Descriere: Sursa unică pentru conversia pixel <-> cm pe podea (imagine 512x512, rotită 180° înainte de procesare).
+  - Formulele empirice (get_real_y, get_center_x, get_scale_x) erau copiate în UTILS.REAL, UTILS.MAP,
+    ZONE_DETECT.detect_zona și, inversate, în ZONE_DETECT.get_zone; acum toate folosesc acest modul.
+  - px_to_cm / cm_to_px primesc array-uri (N, 2). Pixelii întregi se citesc din tabelul precalculat
+    512x512x2, iar coordonatele cm aliniate la 0.5 cm din tabelul invers; restul se calculează direct cu formula.
+  - Tabelele se construiesc la prima utilizare sau se încarcă din fișierele .npy (LUT_CACHE_PATH,
+    INV_LUT_CACHE_PATH), dacă există și corespund modelului curent.
+  - Modelul implicit sunt formulele empirice. Dacă există HOMOGRAPHY_PATH (scris de calibration_fit.py),
+    se folosește omografia planului podelei, cu corecție radială opțională; API-ul rămâne același.
+
+Utilizare exemplu:
+    from UTILS.calibration import px_to_cm, cm_to_px
+
+    cm = px_to_cm([(232, 81), (44, 400)])   # array (2, 2), rotunjit la 0.5 cm
+    px = cm_to_px(cm)                       # array (2, 2), pixeli detectați (float)
+
+Rulare standalone (scrie tabelele în .npy):
+    python calibration.py --save
+"""
+
+import os
+import numpy as np
+
+IMAGE_WIDTH, IMAGE_HEIGHT = 512, 512
+
+# Fereastra (în cm) acoperită de tabelul invers, la pas de 0.5 cm; aceeași ca hărțile de debug
+CM_STEP = 0.5
+CM_X_RANGE = (-25.0, 25.0)
+CM_Y_RANGE = (-10.0, 30.0)
+
+LUT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_px_to_cm.npy")
+INV_LUT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_cm_to_px.npy")
+HOMOGRAPHY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_homography.npz")
+
+
+# --- Formulele de calibrare (lucrează pe scalari sau array-uri) ---
+def get_real_y(rotated_y):
+    """
+    Conversia pentru axa y.
+    Pe baza datelor calibrate:
+      - detected_y = 80  => real_y ≈ 0
+      - detected_y = 474 => real_y ≈ 22.0
+    """
+    return 0.05587 * rotated_y - 4.47
+
+def get_center_x(rotated_y):
+    """
+    Coordonata x (în pixeli) a slotului central, unde real_x = 0:
+      - detected_y = 80  => center_x ≈ 232
+      - detected_y = 474 => center_x ≈ 240
+    """
+    return 0.0203 * rotated_y + 230.38
+
+def get_scale_x(rotated_y):
+    """
+    Factorul cm/pixel pentru abaterea față de centru:
+      - la y mic: ≈ 10 / 193 ≈ 0.0518
+      - la y mare: ≈ 10 / 132 ≈ 0.0758
+    """
+    return 0.0000608 * rotated_y + 0.046936
+
+class EmpiricalCalibration:
+    """Formulele empirice de mai sus (imaginea rotită 180°)."""
+    name = "empirical"
+
+    def px_to_cm(self, detected_x, detected_y):
+        rotated_x = (IMAGE_WIDTH - 1) - detected_x
+        rotated_y = (IMAGE_HEIGHT - 1) - detected_y
+        real_x = (rotated_x - get_center_x(rotated_y)) * get_scale_x(rotated_y)
+        real_y = get_real_y(rotated_y)
+        return real_x, real_y
+
+    def cm_to_px(self, real_x, real_y):
+        rotated_y = (real_y + 4.47) / 0.05587
+        rotated_x = (real_x / get_scale_x(rotated_y)) + get_center_x(rotated_y)
+        return (IMAGE_WIDTH - 1) - rotated_x, (IMAGE_HEIGHT - 1) - rotated_y
+
+
+class HomographyCalibration:
+    """
+    Omografia planului podelei: cm = H * u, unde u este pixelul detectat d corectat radial
+    față de centrul 'center':  u = c + (d - c) * (1 + k1 * r^2),  r = |d - c| / norm.
+    Cu k1 = 0 modelul este o omografie pură.
+    """
+    name = "homography"
+    UNDISTORT_ITERATIONS = 10
+
+    def __init__(self, H, k1=0.0, center=(IMAGE_WIDTH / 2, IMAGE_HEIGHT / 2), norm=None):
+        self.H = np.asarray(H, dtype=np.float64).reshape(3, 3)
+        self.H_inv = np.linalg.inv(self.H)
+        self.k1 = float(k1)
+        self.center = np.asarray(center, dtype=np.float64).reshape(2)
+        self.norm = float(norm) if norm else float(np.hypot(IMAGE_WIDTH, IMAGE_HEIGHT) / 2)
+
+    @staticmethod
+    def _apply(M, x, y):
+        w = M[2, 0] * x + M[2, 1] * y + M[2, 2]
+        return (M[0, 0] * x + M[0, 1] * y + M[0, 2]) / w, (M[1, 0] * x + M[1, 1] * y + M[1, 2]) / w
+
+    def undistort(self, x, y):
+        dx, dy = x - self.center[0], y - self.center[1]
+        f = 1 + self.k1 * (dx * dx + dy * dy) / (self.norm * self.norm)
+        return self.center[0] + dx * f, self.center[1] + dy * f
+
+    def distort(self, ux, uy):
+        """Inversa lui undistort, prin iterație de punct fix (k1 mic)."""
+        ux, uy = np.asarray(ux, dtype=np.float64), np.asarray(uy, dtype=np.float64)
+        if self.k1 == 0:
+            return ux, uy
+        ex, ey = ux - self.center[0], uy - self.center[1]
+        dx, dy = ex, ey
+        for _ in range(self.UNDISTORT_ITERATIONS):
+            f = 1 + self.k1 * (dx * dx + dy * dy) / (self.norm * self.norm)
+            dx, dy = ex / f, ey / f
+        return self.center[0] + dx, self.center[1] + dy
+
+    def px_to_cm(self, detected_x, detected_y):
+        return self._apply(self.H, *self.undistort(detected_x, detected_y))
+
+    def cm_to_px(self, real_x, real_y):
+        return self.distort(*self._apply(self.H_inv, real_x, real_y))
+
+    def save(self, path=HOMOGRAPHY_PATH):
+        np.savez(path, H=self.H, k1=self.k1, center=self.center, norm=self.norm)
+
+    @classmethod
+    def load(cls, path=HOMOGRAPHY_PATH):
+        data = np.load(path)
+        return cls(data["H"], float(data["k1"]), data["center"], float(data["norm"]))
+
+
+_model = None
+
+def get_model():
+    """Modelul activ: omografia din HOMOGRAPHY_PATH dacă există și se poate citi, altfel formulele empirice."""
+    global _model
+    if _model is None:
+        _model = EmpiricalCalibration()
+        if os.path.exists(HOMOGRAPHY_PATH):
+            try:
+                _model = HomographyCalibration.load(HOMOGRAPHY_PATH)
+            except (OSError, ValueError, KeyError, np.linalg.LinAlgError) as e:
+                print(f"Calibrare: nu s-a putut citi {HOMOGRAPHY_PATH} ({e}), se folosesc formulele empirice.")
+    return _model
+
+def set_model(model):
+    """Înlocuiește modelul activ (ex. EmpiricalCalibration() sau HomographyCalibration.load(...))."""
+    global _model
+    _model = model
+    reset_luts()
+
+def px_to_cm_model(detected_x, detected_y):
+    """Conversia exactă (nerotunjită) pixel detectat -> cm cu modelul activ; returnează (real_x, real_y)."""
+    return get_model().px_to_cm(detected_x, detected_y)
+
+def cm_to_px_model(real_x, real_y):
+    """Inversa lui px_to_cm_model: cm -> pixel detectat (float); returnează (detected_x, detected_y)."""
+    return get_model().cm_to_px(real_x, real_y)
+
+
+# --- Tabelele precalculate ---
+def _cm_grid_shape():
+    cols = int(round((CM_X_RANGE[1] - CM_X_RANGE[0]) / CM_STEP)) + 1
+    rows = int(round((CM_Y_RANGE[1] - CM_Y_RANGE[0]) / CM_STEP)) + 1
+    return rows, cols
+
+def build_px_to_cm_lut():
+    """Tabelul (IMAGE_HEIGHT, IMAGE_WIDTH, 2) cu (real_x, real_y) nerotunjit pentru fiecare pixel întreg."""
+    ys, xs = np.mgrid[0:IMAGE_HEIGHT, 0:IMAGE_WIDTH].astype(np.float64)
+    return np.dstack(px_to_cm_model(xs, ys))
+
+def build_cm_to_px_lut():
+    """Tabelul invers (rânduri = y, coloane = x pe grila de 0.5 cm) cu (detected_x, detected_y)."""
+    rows, cols = _cm_grid_shape()
+    ys, xs = np.mgrid[0:rows, 0:cols].astype(np.float64)
+    return np.dstack(cm_to_px_model(xs * CM_STEP + CM_X_RANGE[0], ys * CM_STEP + CM_Y_RANGE[0]))
+
+def _load_lut(path, shape, sample):
+    """
+    Încarcă un tabel din .npy; îl respinge dacă forma diferă sau dacă nu reproduce
+    formulele curente în punctele de control 'sample' ((rânduri, coloane), valori așteptate).
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        lut = np.load(path)
+    except (OSError, ValueError):
+        return None
+    (rows, cols), expected = sample
+    if lut.shape != shape or not np.array_equal(lut[rows, cols], expected):
+        print(f"Calibrare: {path} nu corespunde formulelor curente, se reconstruiește.")
+        return None
+    return lut
+
+def _control_points(n_rows, n_cols, model, to_input):
+    rows = np.linspace(0, n_rows - 1, 5).astype(np.int64).repeat(5)
+    cols = np.tile(np.linspace(0, n_cols - 1, 5).astype(np.int64), 5)
+    x, y = to_input(rows, cols)
+    return (rows, cols), np.column_stack(model(x, y))
+
+_luts = {}
+
+def get_px_to_cm_lut():
+    if "px_to_cm" not in _luts:
+        sample = _control_points(IMAGE_HEIGHT, IMAGE_WIDTH, px_to_cm_model,
+                                 lambda r, c: (c.astype(np.float64), r.astype(np.float64)))
+        lut = _load_lut(LUT_CACHE_PATH, (IMAGE_HEIGHT, IMAGE_WIDTH, 2), sample)
+        _luts["px_to_cm"] = lut if lut is not None else build_px_to_cm_lut()
+    return _luts["px_to_cm"]
+
+def get_cm_to_px_lut():
+    if "cm_to_px" not in _luts:
+        rows, cols = _cm_grid_shape()
+        sample = _control_points(rows, cols, cm_to_px_model,
+                                 lambda r, c: (c * CM_STEP + CM_X_RANGE[0], r * CM_STEP + CM_Y_RANGE[0]))
+        lut = _load_lut(INV_LUT_CACHE_PATH, (rows, cols, 2), sample)
+        _luts["cm_to_px"] = lut if lut is not None else build_cm_to_px_lut()
+    return _luts["cm_to_px"]
+
+def save_luts(path=LUT_CACHE_PATH, inv_path=INV_LUT_CACHE_PATH):
+    """Scrie ambele tabele în fișierele .npy, pentru a fi încărcate la pornire."""
+    np.save(path, get_px_to_cm_lut())
+    np.save(inv_path, get_cm_to_px_lut())
+
+def reset_luts():
+    """Golește tabelele din memorie (după schimbarea calibrării)."""
+    _luts.clear()
+
+
+# --- API-ul de conversie ---
+def _grid_index(values, origin, step, size):
+    """Indicii întregi pentru valorile aflate exact pe grilă (origin + k*step, 0 <= k < size) și masca lor."""
+    k = (values - origin) / step
+    on_grid = np.isfinite(k) & (k == np.floor(k)) & (k >= 0) & (k < size)
+    return np.where(on_grid, k, 0).astype(np.int64), on_grid
+
+def px_to_cm(points, round_half=True):
+    """
+    Convertește un array (N, 2) de pixeli detectați (x, y) în cm (real_x, real_y).
+    Cu round_half=True rezultatul este rotunjit la 0.5 cm, ca în getRealCoordinates.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    xi, x_ok = _grid_index(pts[:, 0], 0, 1, IMAGE_WIDTH)
+    yi, y_ok = _grid_index(pts[:, 1], 0, 1, IMAGE_HEIGHT)
+    on_grid = x_ok & y_ok
+
+    out = np.empty_like(pts)
+    out[on_grid] = get_px_to_cm_lut()[yi[on_grid], xi[on_grid]]
+    off = ~on_grid
+    if off.any():
+        out[off] = np.column_stack(px_to_cm_model(pts[off, 0], pts[off, 1]))
+    if round_half:
+        # + 0.0 transformă -0.0 în 0.0, la fel ca round() din Python
+        out = np.round(out * 2) / 2 + 0.0
+    return out
+
+def cm_to_px(points):
+    """Convertește un array (N, 2) de coordonate (real_x, real_y) în cm în pixeli detectați (float)."""
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rows, cols = _cm_grid_shape()
+    xi, x_ok = _grid_index(pts[:, 0], CM_X_RANGE[0], CM_STEP, cols)
+    yi, y_ok = _grid_index(pts[:, 1], CM_Y_RANGE[0], CM_STEP, rows)
+    on_grid = x_ok & y_ok
+
+    out = np.empty_like(pts)
+    out[on_grid] = get_cm_to_px_lut()[yi[on_grid], xi[on_grid]]
+    off = ~on_grid
+    if off.any():
+        out[off] = np.column_stack(cm_to_px_model(pts[off, 0], pts[off, 1]))
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Tabelele de calibrare pixel <-> cm.")
+    parser.add_argument("--save", action="store_true", help="scrie tabelele în fișierele .npy")
+    args = parser.parse_args()
+    if args.save:
+        save_luts()
+        print("Salvat:", LUT_CACHE_PATH, INV_LUT_CACHE_PATH)
+    print("Model:", get_model().name)
+    for px in [(44, 81), (232, 81), (430, 81), (44, 400), (240, 400), (430, 400)]:
+        cm = px_to_cm([px])[0]
+        back = np.round(cm_to_px([cm])[0], 1)
+        print(f"Detected: {px} -> Real: {tuple(cm.tolist())} cm -> px: {tuple(back.tolist())}")
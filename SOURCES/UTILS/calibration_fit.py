@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Modul: calibration_fit.py
+Descriere: Potrivește omografia planului podelei (pixel detectat -> cm), cu corecție radială opțională,
+           din corespondențe măsurate și o salvează în UTILS.calibration.HOMOGRAPHY_PATH.
+           După salvare, px_to_cm / cm_to_px din UTILS.calibration folosesc automat noul model.
+
+Fișierul de corespondențe (CSV, liniile cu '#' sunt ignorate):
+    px_x, px_y, cm_x, cm_y
+    232, 81, 3.0, 19.5
+    ...
+unde (px_x, px_y) este poziția detectată în imaginea 512x512 și (cm_x, cm_y) poziția măsurată pe podea,
+în aceeași convenție ca getRealCoordinates (x pozitiv la stânga, y înainte).
+
+Utilizare:
+    python calibration_fit.py puncte.csv [--radial] [--ransac 1.0] [--save]
+    python calibration_fit.py --from-formulas --save   # omografia cea mai apropiată de formulele empirice
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+import cv2
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from UTILS.calibration import (IMAGE_WIDTH, IMAGE_HEIGHT, HOMOGRAPHY_PATH,
+                               EmpiricalCalibration, HomographyCalibration)
+
+# Intervalul căutat pentru coeficientul radial k1 (raza normalizată la jumătatea diagonalei)
+K1_RANGE = (-0.5, 0.5)
+K1_TOLERANCE = 1e-5
+
+
+def load_correspondences(path):
+    """Returnează (px, cm): două array-uri (N, 2) citite din CSV."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                values = [float(v) for v in line.replace(";", ",").split(",")]
+            except ValueError:
+                # antetul (px_x, px_y, ...) sau o linie invalidă
+                continue
+            if len(values) != 4:
+                print(f"Linia {line_no} ignorată: sunt necesare 4 valori.")
+                continue
+            rows.append(values)
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    return data[:, :2], data[:, 2:]
+
+
+def sample_formulas(step=32):
+    """Corespondențe generate din formulele empirice, pe o grilă de pixeli (pentru comparație/bootstrap)."""
+    ys, xs = np.mgrid[step // 2:IMAGE_HEIGHT:step, step // 2:IMAGE_WIDTH:step].astype(np.float64)
+    px = np.column_stack((xs.ravel(), ys.ravel()))
+    cm = np.column_stack(EmpiricalCalibration().px_to_cm(px[:, 0], px[:, 1]))
+    return px, cm
+
+
+def residuals(model, px, cm):
+    """Distanța (cm) dintre poziția prezisă și cea măsurată, pentru fiecare punct."""
+    pred = np.column_stack(model.px_to_cm(px[:, 0], px[:, 1]))
+    return np.hypot(*(pred - cm).T)
+
+
+def fit_homography(px, cm, k1=0.0, ransac_cm=None):
+    """
+    Potrivește H pentru un k1 fixat. Cu ransac_cm se elimină punctele cu eroare mai mare
+    decât acest prag (cm). Returnează (model, inlier_mask).
+    """
+    probe = HomographyCalibration(np.eye(3), k1)
+    ux, uy = probe.undistort(px[:, 0], px[:, 1])
+    src = np.column_stack((ux, uy)).astype(np.float32)
+    dst = cm.astype(np.float32)
+    if ransac_cm:
+        H, mask = cv2.findHomography(src, dst, cv2.RANSAC, ransac_cm)
+    else:
+        H, mask = cv2.findHomography(src, dst, 0)
+    if H is None:
+        raise ValueError("Omografia nu a putut fi calculată (puncte coliniare sau prea puține).")
+    inliers = mask.ravel().astype(bool) if mask is not None else np.ones(len(px), dtype=bool)
+    return HomographyCalibration(H, k1, probe.center, probe.norm), inliers
+
+
+def fit_calibration(px, cm, radial=False, ransac_cm=None):
+    """
+    Potrivește omografia și, cu radial=True, caută k1 (golden-section) care minimizează
+    eroarea RMS; H se repotrivește la fiecare pas. Returnează (model, inlier_mask).
+    """
+    min_points = 5 if radial else 4
+    if len(px) < min_points:
+        raise ValueError(f"Sunt necesare cel puțin {min_points} corespondențe (primite: {len(px)}).")
+
+    model, inliers = fit_homography(px, cm, ransac_cm=ransac_cm)
+    if not radial:
+        return model, inliers
+
+    px_in, cm_in = px[inliers], cm[inliers]
+
+    def rms(k1):
+        try:
+            candidate, _ = fit_homography(px_in, cm_in, k1)
+        except ValueError:
+            return np.inf
+        return float(np.sqrt(np.mean(residuals(candidate, px_in, cm_in) ** 2)))
+
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = K1_RANGE
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = rms(c), rms(d)
+    while b - a > K1_TOLERANCE:
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = rms(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = rms(d)
+    k1 = (a + b) / 2
+    if rms(k1) >= rms(0.0):
+        k1 = 0.0
+    model, _ = fit_homography(px_in, cm_in, k1)
+    return model, inliers
+
+
+def print_report(model, px, cm, inliers):
+    err = residuals(model, px, cm)
+    empirical = residuals(EmpiricalCalibration(), px, cm)
+    print(f"Puncte: {len(px)} (inliers: {int(inliers.sum())})")
+    print("H =")
+    print(np.array2string(model.H, precision=6, suppress_small=True))
+    print(f"k1 = {model.k1:.6f}")
+    print(f"Eroare omografie: RMS {np.sqrt(np.mean(err[inliers] ** 2)):.3f} cm | max {err[inliers].max():.3f} cm")
+    print(f"Eroare formule empirice: RMS {np.sqrt(np.mean(empirical ** 2)):.3f} cm | max {empirical.max():.3f} cm")
+    worst = np.argsort(err)[::-1][:5]
+    print("Cele mai mari erori:")
+    for i in worst:
+        flag = "" if inliers[i] else " (outlier)"
+        print(f"  px ({px[i, 0]:.0f}, {px[i, 1]:.0f}) -> cm ({cm[i, 0]:.2f}, {cm[i, 1]:.2f}): {err[i]:.3f} cm{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Potrivește omografia podelei din corespondențe pixel/cm.")
+    parser.add_argument("points", nargs="?", help="CSV cu px_x, px_y, cm_x, cm_y")
+    parser.add_argument("--from-formulas", action="store_true",
+                        help="folosește puncte generate din formulele empirice în locul unui CSV")
+    parser.add_argument("--radial", action="store_true", help="potrivește și coeficientul radial k1")
+    parser.add_argument("--ransac", type=float, default=None, metavar="CM",
+                        help="elimină corespondențele cu eroare mai mare de CM (RANSAC)")
+    parser.add_argument("--save", action="store_true", help=f"salvează modelul în {HOMOGRAPHY_PATH}")
+    parser.add_argument("--output", default=HOMOGRAPHY_PATH, help="fișierul .npz de ieșire")
+    args = parser.parse_args()
+
+    if args.from_formulas:
+        px, cm = sample_formulas()
+    elif args.points:
+        px, cm = load_correspondences(args.points)
+    else:
+        parser.error("specificați un fișier de corespondențe sau --from-formulas")
+
+    model, inliers = fit_calibration(px, cm, radial=args.radial, ransac_cm=args.ransac)
+    print_report(model, px, cm, inliers)
+    if args.save:
+        model.save(args.output)
+        print("Salvat:", args.output)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Modul: map_render.py
+Descriere: Randare fără display (NumPy + OpenCV) a vizualizărilor de debug:
+  - harta cutiilor (ca BoxMapApp), zonele relative la un target (regulile ZONE_RULES din MAP),
+  - zona de depozitare (hull / dreptunghi) și pozițiile libere (ca debug_interface din GET_FREE),
+  - gridul mozaicului 64x64 și celulele cyan în cm (ca vederile Tkinter din detect_zona).
+  Fundalul (gridul de 1 cm și axele) se desenează o singură dată pe MapView; fiecare randare
+  pornește de la o copie a lui. RenderLogger scrie imaginile ca PNG (director sau buffer în memorie)
+  doar pentru fiecare al N-lea apel, deci starea vizuală se poate loga și în producție.
+
+Utilizare exemplu:
+    from UTILS.map_render import RenderLogger, render_map
+
+    log = RenderLogger(every=30, directory="debug_frames")
+    log.log("free_spot", render_map, boxes, zone_limits=zone_limits, hull=hull,
+            candidate_spot=spot, free_candidates=candidates)
+    png = encode_png(render_map(boxes, target_id="K"))   # bytes
+"""
+
+import os
+import sys
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from UTILS.calibration import CM_X_RANGE, CM_Y_RANGE
+from UTILS.MAP import ZONE_RULES, ZONE_BOX_HALF, ZONE_DANGER, ZONE_PROXIMITY, ZONE_WARNING
+
+RENDER_SCALE = 10  # pixeli per cm, ca pe canvas-urile Tkinter
+RENDER_LOG_EVERY = 30
+RENDER_BUFFER_SIZE = 16
+
+# Culori BGR pentru numele folosite de cutii ("color" din process_boxes) și de vederile Tkinter
+COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "gray": (190, 190, 190),
+    "grid": (204, 204, 204),
+    "red": (0, 0, 255),
+    "green": (0, 200, 0),
+    "blue": (255, 0, 0),
+    "yellow": (0, 255, 255),
+    "orange": (0, 165, 255),
+    "purple": (240, 32, 160),
+    "magenta": (255, 0, 255),
+    "cyan": (255, 255, 0),
+    "beige": (160, 200, 210),
+}
+ZONE_COLORS = {
+    ZONE_DANGER: COLORS["red"],
+    ZONE_PROXIMITY: COLORS["purple"],
+    ZONE_WARNING: COLORS["orange"],
+}
+
+
+def color_bgr(name, default=(128, 128, 128)):
+    """Culoarea BGR pentru un nume (ex. "red") sau un cod "#rrggbb"."""
+    if isinstance(name, str):
+        key = name.lower()
+        if key in COLORS:
+            return COLORS[key]
+        if key.startswith("#") and len(key) == 7:
+            r, g, b = (int(key[i:i + 2], 16) for i in (1, 3, 5))
+            return (b, g, r)
+    return default
+
+
+class MapView:
+    """
+    Fereastra [x_range] x [y_range] (cm) a hărților de debug, la 'scale' pixeli/cm.
+    Punctul (x, y) cm corespunde pixelului ((x - x_min) * scale, (y_max - y) * scale).
+    """
+    def __init__(self, scale=RENDER_SCALE, x_range=CM_X_RANGE, y_range=CM_Y_RANGE):
+        self.scale = scale
+        self.x_range = x_range
+        self.y_range = y_range
+        self.width = int((x_range[1] - x_range[0]) * scale)
+        self.height = int((y_range[1] - y_range[0]) * scale)
+        self._background = None
+
+    def to_px(self, points):
+        """(N, 2) cm -> (N, 2) int32 pixeli; punctele sunt limitate la fereastră (ex. zonele nemărginite)."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        xs = np.clip(pts[:, 0], self.x_range[0], self.x_range[1])
+        ys = np.clip(pts[:, 1], self.y_range[0], self.y_range[1])
+        cols = (xs - self.x_range[0]) * self.scale
+        rows = (self.y_range[1] - ys) * self.scale
+        return np.round(np.column_stack((cols, rows))).astype(np.int32)
+
+    def to_cm(self, col, row):
+        return col / self.scale + self.x_range[0], self.y_range[1] - row / self.scale
+
+    def background(self):
+        """Gridul de 1 cm, axele și etichetele la 5 cm; se desenează o singură dată."""
+        if self._background is None:
+            img = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+            img[:, ::self.scale] = COLORS["grid"]
+            img[::self.scale, :] = COLORS["grid"]
+            (ox, oy), = self.to_px([(0, 0)])
+            cv2.line(img, (0, int(oy)), (self.width, int(oy)), COLORS["black"], 2)
+            cv2.line(img, (int(ox), 0), (int(ox), self.height), COLORS["black"], 2)
+            for x in range(int(self.x_range[0]), int(self.x_range[1]) + 1, 5):
+                (cx, _), = self.to_px([(x, 0)])
+                cv2.line(img, (int(cx), int(oy) - 5), (int(cx), int(oy) + 5), COLORS["black"], 1)
+                cv2.putText(img, str(x), (int(cx) - 8, int(oy) + 18), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.35, COLORS["black"], 1, cv2.LINE_AA)
+            for y in range(int(self.y_range[0]), int(self.y_range[1]) + 1, 5):
+                (_, cy), = self.to_px([(0, y)])
+                cv2.line(img, (int(ox) - 5, int(cy)), (int(ox) + 5, int(cy)), COLORS["black"], 1)
+                cv2.putText(img, str(y), (int(ox) - 28, int(cy) + 4), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.35, COLORS["black"], 1, cv2.LINE_AA)
+            img.flags.writeable = False
+            self._background = img
+        return self._background
+
+    def new_image(self):
+        return self.background().copy()
+
+
+_default_view = None
+
+def get_default_view():
+    """Vederea partajată (fereastra hărților de debug la RENDER_SCALE); fundalul se desenează o singură dată."""
+    global _default_view
+    if _default_view is None:
+        _default_view = MapView()
+    return _default_view
+
+
+def _put_text_centered(img, text, center, color, font_scale=0.45):
+    if not text:
+        return
+    (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+    org = (int(center[0] - w / 2), int(center[1] + h / 2))
+    cv2.putText(img, text, org, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 1, cv2.LINE_AA)
+
+
+def draw_boxes(img, boxes, view, size_cm=2 * ZONE_BOX_HALF):
+    """Cutiile (pătrate de size_cm, culoarea și litera cutiei), ca în BoxMapApp / debug_interface."""
+    if not boxes:
+        return img
+    centers = view.to_px([box["real_position"] for box in boxes.values()])
+    half = int(round(size_cm * view.scale / 2))
+    for (cx, cy), box in zip(centers.tolist(), boxes.values()):
+        cv2.rectangle(img, (cx - half, cy - half), (cx + half, cy + half), color_bgr(box.get("color")), -1)
+        cv2.rectangle(img, (cx - half, cy - half), (cx + half, cy + half), COLORS["black"], 2)
+        _put_text_centered(img, box.get("letter", ""), (cx, cy), COLORS["white"])
+    return img
+
+
+def draw_zones(img, target_xy, view, rules=ZONE_RULES, alpha=0.5):
+    """Zonele relative la o poziție target, direct din regulile ZONE_RULES, semi-transparente."""
+    bx, by = target_xy
+    overlay = img.copy()
+    # de la prioritatea cea mai mică la cea mai mare, ca zonele prioritare să rămână deasupra
+    for code, rects, _, _ in reversed(rules):
+        color = ZONE_COLORS.get(code, COLORS["gray"])
+        for x0, x1, y0, y1 in rects:
+            p0, p1 = view.to_px([(bx + x0, by + y1), (bx + x1, by + y0)])
+            cv2.rectangle(overlay, tuple(p0.tolist()), tuple(p1.tolist()), color, -1)
+    cv2.addWeighted(overlay, alpha, img, 1 - alpha, 0, dst=img)
+    return img
+
+
+def draw_zone_outline(img, view, zone_limits=None, hull=None, color=COLORS["blue"]):
+    """Conturul zonei de depozitare: hull-ul (cm) sau, dacă lipsește, dreptunghiul zone_limits."""
+    if hull is not None and len(hull) >= 3:
+        cv2.polylines(img, [view.to_px(hull)], True, color, 2)
+    elif zone_limits:
+        p0, p1 = view.to_px([(zone_limits["left"], zone_limits["top"]),
+                             (zone_limits["right"], zone_limits["bottom"])])
+        cv2.rectangle(img, tuple(p0.tolist()), tuple(p1.tolist()), color, 2)
+    return img
+
+
+def draw_free_spots(img, view, free_candidates=None, candidate_spot=None):
+    """Pozițiile libere verificate (verde) și poziția aleasă (magenta), ca în debug_interface."""
+    if free_candidates is not None and len(free_candidates):
+        for cx, cy in view.to_px(free_candidates).tolist():
+            cv2.circle(img, (cx, cy), 5, COLORS["green"], 2)
+    if candidate_spot is not None:
+        (cx, cy), = view.to_px([candidate_spot]).tolist()
+        cv2.circle(img, (cx, cy), int(round(ZONE_BOX_HALF * view.scale)), COLORS["magenta"], 3)
+    return img
+
+
+def render_map(boxes, target_id=None, zone_limits=None, hull=None, candidate_spot=None,
+               free_candidates=None, view=None):
+    """
+    Harta completă: zonele relative la target_id (dacă e dat), zona de depozitare, cutiile
+    și pozițiile libere. Returnează o imagine BGR (view.height, view.width, 3).
+    """
+    view = view or get_default_view()
+    img = view.new_image()
+    if target_id is not None and target_id in boxes:
+        draw_zones(img, boxes[target_id]["real_position"], view)
+    draw_zone_outline(img, view, zone_limits, hull)
+    draw_boxes(img, boxes, view)
+    if target_id is not None and target_id in boxes:
+        (cx, cy), = view.to_px([boxes[target_id]["real_position"]]).tolist()
+        half = int(round(ZONE_BOX_HALF * view.scale)) + 3
+        cv2.rectangle(img, (cx - half, cy - half), (cx + half, cy + half), COLORS["blue"], 2)
+    draw_free_spots(img, view, free_candidates, candidate_spot)
+    return img
+
+
+def render_mosaic_grid(mosaic, cell_size=8, marked_color=(0, 255, 255), clicked=None):
+    """
+    Gridul mozaicului (ca show_tkinter_grid): celulele marcate (cyan în mozaicul RGB) colorate,
+    restul albe, cu linii de grid. clicked: celule (row, col) evidențiate cu verde.
+    """
+    mask = (mosaic == marked_color).all(axis=2)
+    cells = np.full(mask.shape + (3,), 255, dtype=np.uint8)
+    cells[mask] = COLORS["cyan"]
+    if clicked:
+        rows, cols = np.array(list(clicked)).reshape(-1, 2).T
+        cells[rows, cols] = COLORS["green"]
+    img = np.repeat(np.repeat(cells, cell_size, axis=0), cell_size, axis=1)
+    img[::cell_size, :] = COLORS["black"]
+    img[:, ::cell_size] = COLORS["black"]
+    return img
+
+
+def render_cm_cells(cyan_coords, view=None):
+    """Celulele de 1 cm care conțin coordonate cyan (ca show_tkinter_cm_interface)."""
+    view = view or get_default_view()
+    img = view.new_image()
+    coords = np.round(np.asarray(cyan_coords, dtype=np.float64).reshape(-1, 2)).astype(np.int64)
+    x_min, x_max = view.x_range
+    y_min, y_max = view.y_range
+    keep = (coords[:, 0] >= x_min) & (coords[:, 0] < x_max) & (coords[:, 1] >= y_min) & (coords[:, 1] < y_max)
+    for gx, gy in np.unique(coords[keep], axis=0).tolist():
+        p0, p1 = view.to_px([(gx, gy + 1), (gx + 1, gy)])
+        cv2.rectangle(img, tuple(p0.tolist()), tuple(p1.tolist()), COLORS["cyan"], -1)
+        cv2.rectangle(img, tuple(p0.tolist()), tuple(p1.tolist()), COLORS["black"], 1)
+    return img
+
+
+def encode_png(img):
+    """Imaginea codată PNG (bytes), pentru buffere în memorie / trimitere."""
+    ok, buf = cv2.imencode(".png", img)
+    if not ok:
+        raise ValueError("Imaginea nu a putut fi codată PNG.")
+    return buf.tobytes()
+
+
+class RenderLogger:
+    """
+    Loghează randări la fiecare al 'every'-lea apel pentru fiecare nume; celelalte apeluri nu randează nimic.
+    Cu 'directory' imaginile se scriu ca PNG (<nume>_<contor>.png), altfel se păstrează ultimele
+    'keep' în self.buffer ca (nume, contor, timestamp, png_bytes).
+    """
+    def __init__(self, every=RENDER_LOG_EVERY, directory=None, keep=RENDER_BUFFER_SIZE):
+        self.every = max(1, int(every))
+        self.directory = directory
+        self.buffer = deque(maxlen=keep)
+        self.counters = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def due(self, name):
+        """Avansează contorul pentru 'name' și spune dacă apelul curent trebuie randat."""
+        count = self.counters.get(name, 0)
+        self.counters[name] = count + 1
+        return count % self.every == 0
+
+    def log(self, name, render, *args, **kwargs):
+        """Apelează render(*args, **kwargs) doar când e cazul; returnează imaginea sau None."""
+        if not self.due(name):
+            return None
+        img = render(*args, **kwargs)
+        count = self.counters[name] - 1
+        if self.directory:
+            cv2.imwrite(os.path.join(self.directory, f"{name}_{count:06d}.png"), img)
+        else:
+            self.buffer.append((name, count, time.time(), encode_png(img)))
+        return img
+
+
+if __name__ == "__main__":
+    from UTILS.MAP import process_boxes
+
+    session = {
+        "K": {"position": (250, 150), "size": (20, 20), "box_color": "blue", "letters": "K", "angle": 0},
+        "A": {"position": (300, 200), "size": (30, 30), "box_color": "red", "letters": "A", "angle": 0},
+    }
+    boxes = process_boxes(session)
+    out = sys.argv[1] if len(sys.argv) > 1 else "map_render.png"
+    cv2.imwrite(out, render_map(boxes, target_id="K"))
+    print("Harta scrisă în", out)
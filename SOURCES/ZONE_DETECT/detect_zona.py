@@ -7,7 +7,7 @@ Utilizare modulară:
 
   # Se presupune că 'image_copy' este deja obținută din alt modul (de exemplu, din camera)
   coords_cyan = detect_rotated_lines_in_mosaic(image_copy, debug=False)
-  # coords_cyan va fi o listă de tuple (x_cm, y_cm) deduplicate
+  # coords_cyan va fi un array (N, 2) cu (x_cm, y_cm)
      pentru fiecare celulă detectată cu bloc cyan
 
 Dacă debug=True, se vor afișa ferestrele OpenCV și interfețele Tkinter.
@@ -18,41 +18,25 @@ import numpy as np
 import tkinter as tk
 import math
 from CAMERA.camera_session import capture_raw_image  # Se folosește doar pentru rularea standalone
+from CAMERA.frame_context import as_frame_context
+from UTILS.calibration import px_to_cm
 
 ### Funcții pentru conversie (corecție perspectivă) ###
 def convert_px_to_cm(detected_x, detected_y):
     """
     Converteste coordonatele (detected_x, detected_y) din pixeli în coordonate reale (cm)
-    folosind formulele empirice, apoi rotunjește rezultatul la cel mai apropiat 0.5 cm.
-    
-    Se inversează doar coordonata y:
-      - Imaginea are 512 pixeli în înălțime.
-      - Pentru un detected_y mic (susul imaginii) se obține un y mare,
-        iar pentru detected_y mare (josul imaginii) y devine mic.
+    folosind calibrarea din UTILS.calibration, rotunjite la cel mai apropiat 0.5 cm.
     """
-    
-   # Dimensiunile imaginii
-    width, height = 512, 512
-    
-    # Conversia coordonatelor pentru rotația de 180°:
-    # Noua coordonată x este (width - 1) - detected_x
-    # Noua coordonată y este (height - 1) - detected_y
-    detected_x = (width - 1) - detected_x
-    detected_y = (height - 1) - detected_y
-
-
-
-    
-    real_y = 0.05587 * detected_y + -4.47
+    real_x, real_y = px_to_cm([(detected_x, detected_y)])[0]
+    return float(real_x), float(real_y)
 
-    center_x = 0.0203 * detected_y + 230.38
-    scale_x = 0.0000608 * detected_y + 0.046936
-    real_x = (detected_x - center_x) * scale_x
 
-    real_x = round(real_x * 2) / 2
-    real_y = round(real_y * 2) / 2
-
-    return real_x, real_y
+def convert_px_to_cm_batch(detected_xy):
+    """
+    Varianta vectorizată a convert_px_to_cm: primește un array (N, 2) de coordonate
+    (detected_x, detected_y) în pixeli și returnează un array (N, 2) float în cm, rotunjit la 0.5 cm.
+    """
+    return px_to_cm(detected_xy)
 
 
 
@@ -62,25 +46,29 @@ def convert_px_to_cm(detected_x, detected_y):
 
 ### Funcții pentru procesarea imaginii ###
 def create_64x64_mosaic(raw_img):
+    """
+    Media fiecărui bloc de 8x8 pixeli, calculată printr-un singur reshape + sumă întreagă
+    (aceleași valori ca media bloc cu bloc, trunchiate la uint8).
+    """
     h, w, c = raw_img.shape
     if (h != 512 or w != 512):
         print("Atenție: imaginea nu e 512x512. Continuăm oricum...")
-    mosaic_64 = np.zeros((64, 64, 3), dtype=np.uint8)
     block_size = 8
-    for row in range(64):
-        for col in range(64):
-            y_start = row * block_size
-            y_end   = (row + 1) * block_size
-            x_start = col * block_size
-            x_end   = (col + 1) * block_size
-            block = raw_img[y_start:y_end, x_start:x_end]
-            mean_color = block.mean(axis=(0, 1)).astype(np.uint8)
-            mosaic_64[row, col] = mean_color
-    return mosaic_64
-
-def mark_red_blocks_as_cyan(mosaic_64):
+    if h < 64 * block_size or w < 64 * block_size:
+        # imagine prea mică pentru blocuri întregi de 8x8: medie pe arie
+        return cv2.resize(raw_img, (64, 64), interpolation=cv2.INTER_AREA)
+    blocks = raw_img[:64 * block_size, :64 * block_size].reshape(64, block_size, 64, block_size, c)
+    sums = blocks.sum(axis=(1, 3), dtype=np.uint32)
+    return (sums // (block_size * block_size)).astype(np.uint8)
+
+def mark_red_blocks_as_cyan(mosaic_64, hsv=None):
+    """
+    Marchează cu cyan celulele roșii/roz din mozaic. Dacă 'hsv' (mozaicul deja
+    convertit RGB->HSV) este furnizat, conversia nu se mai repetă.
+    """
     mosaic_64_marked = mosaic_64.copy()
-    hsv = cv2.cvtColor(mosaic_64_marked, cv2.COLOR_RGB2HSV)
+    if hsv is None:
+        hsv = cv2.cvtColor(mosaic_64, cv2.COLOR_RGB2HSV)
     lower_red1 = np.array([0, 80, 80])
     upper_red1 = np.array([15, 255, 255])
     lower_red2 = np.array([160, 80, 80])
@@ -97,20 +85,13 @@ def mark_red_blocks_as_cyan(mosaic_64):
 
 def get_cyan_block_coordinates(mosaic):
     """
-    Parcurge mozaicul și pentru fiecare celulă care este cyan (0,255,255),
-    calculează coordonatele centrale (în pixeli) și le convertește în cm.
-    Returnează o listă de tuple (real_x, real_y).
+    Găsește toate celulele cyan (0,255,255) din mozaic printr-o mască booleană,
+    calculează coordonatele centrale (în pixeli) și le convertește în cm într-un singur apel.
+    Returnează un array (N, 2) cu (real_x, real_y), în ordinea rând cu rând a celulelor.
     """
-    cyan_coords = []
-    rows, cols, _ = mosaic.shape
-    for i in range(rows):
-        for j in range(cols):
-            if (mosaic[i, j] == np.array([0, 255, 255])).all():
-                detected_x = j * 8 + 4
-                detected_y = i * 8 + 4
-                coord = convert_px_to_cm(detected_x, detected_y)
-                cyan_coords.append(coord)
-    return cyan_coords
+    rows, cols = np.nonzero((mosaic == (0, 255, 255)).all(axis=2))
+    detected = np.column_stack((cols * 8 + 4, rows * 8 + 4))
+    return convert_px_to_cm_batch(detected)
 
 ### Funcții pentru afișare (doar pentru debug) ###
 def show_opencv_windows(raw_img, mosaic_64_marked, contours):
@@ -149,6 +130,8 @@ def show_tkinter_grid(mosaic, timeout=70000):
     height = rows * cell_size
 
     clicked_cells = {}
+    cyan_mask = (mosaic == np.array([0, 255, 255])).all(axis=2)
+    cell_items = {}  # (i, j) -> id-ul dreptunghiului, creat o singură dată
     root = tk.Tk()
     root.title("Grid 64x64 - Vedere NECorectată cu click")
     frame = tk.Frame(root)
@@ -158,28 +141,26 @@ def show_tkinter_grid(mosaic, timeout=70000):
     listbox = tk.Listbox(frame, height=6)
     listbox.pack(side=tk.BOTTOM, fill=tk.X)
     
+    def cell_color(i, j):
+        if (i, j) in clicked_cells:
+            return "green"
+        return "#00ffff" if cyan_mask[i, j] else "white"
+
     def draw_grid():
-        canvas.delete("all")
+        # Celulele se creează o singură dată; click-ul și zoom-ul doar modifică elementele existente
         for i in range(rows):
             for j in range(cols):
                 x0 = j * cell_size
                 y0 = i * cell_size
                 x1 = x0 + cell_size
                 y1 = y0 + cell_size
-                if (i, j) in clicked_cells:
-                    fill_color = "green"
-                else:
-                    if (mosaic[i, j] == np.array([0, 255, 255])).all():
-                        fill_color = "#00ffff"
-                    else:
-                        fill_color = "white"
-                canvas.create_rectangle(x0, y0, x1, y1, fill=fill_color, outline="black")
+                cell_items[(i, j)] = canvas.create_rectangle(x0, y0, x1, y1, fill=cell_color(i, j), outline="black")
         canvas.configure(scrollregion=canvas.bbox("all"))
     
     def on_cell_click(event):
         nonlocal cell_size
-        j = event.x // cell_size
-        i = event.y // cell_size
+        j = int(event.x // cell_size)
+        i = int(event.y // cell_size)
         if i < 0 or i >= rows or j < 0 or j >= cols:
             return
         detected_x = j * 8 + 4
@@ -190,7 +171,7 @@ def show_tkinter_grid(mosaic, timeout=70000):
         if (i, j) not in clicked_cells:
             clicked_cells[(i, j)] = coord_text
             listbox.insert(tk.END, coord_text)
-        draw_grid()
+            canvas.itemconfig(cell_items[(i, j)], fill=cell_color(i, j))
     
     def zoom(event):
         nonlocal cell_size
@@ -202,8 +183,9 @@ def show_tkinter_grid(mosaic, timeout=70000):
             factor = 0.9
         else:
             return
-        cell_size = int(cell_size * factor)
-        draw_grid()
+        cell_size *= factor
+        canvas.scale("all", 0, 0, factor, factor)
+        canvas.configure(scrollregion=canvas.bbox("all"))
     
     canvas.bind("<Button-1>", on_cell_click)
     canvas.bind("<Button-4>", zoom)
@@ -269,6 +251,25 @@ def show_tkinter_cm_interface(cyan_coords, timeout=60000):
     root.after(timeout, root.destroy)
     root.mainloop()
 
+def get_marked_mosaic(image_copy):
+    """
+    Mozaicul 64x64 al cadrului cu celulele roșii/roz marcate cu cyan.
+    Rezultatul este memorat în FrameContext, deci apelurile repetate pe același cadru sunt gratuite.
+    """
+    ctx = as_frame_context(image_copy)
+    mosaic_64 = ctx.derive("zone_mosaic_64", lambda: create_64x64_mosaic(ctx.image))
+    mosaic_hsv = ctx.derive("zone_mosaic_64_hsv", lambda: cv2.cvtColor(mosaic_64, cv2.COLOR_RGB2HSV))
+    return ctx.derive("zone_mosaic_64_marked", lambda: mark_red_blocks_as_cyan(mosaic_64, hsv=mosaic_hsv))
+
+def get_cyan_cell_mask(image_copy):
+    """
+    Masca booleană 64x64 a celulelor cyan. Ordinea rând cu rând a celulelor True
+    corespunde rândurilor returnate de get_cyan_block_coordinates / detect_rotated_lines_in_mosaic.
+    """
+    ctx = as_frame_context(image_copy)
+    return ctx.derive("zone_cyan_mask",
+                      lambda: (get_marked_mosaic(ctx) == (0, 255, 255)).all(axis=2))
+
 ### Funcția principală modificată ###
 def detect_rotated_lines_in_mosaic(image_copy, debug=False):
     """
@@ -279,26 +280,22 @@ def detect_rotated_lines_in_mosaic(image_copy, debug=False):
     Dacă debug=True, se afișează ferestrele OpenCV și interfețele Tkinter.
     
     Parametru:
-      - image_copy: O copie a imaginii (preprocesată, de dimensiune 512x512) care va fi folosită pentru procesare.
+      - image_copy: imaginea (preprocesată, de dimensiune 512x512) sau un FrameContext al cadrului.
+        Imaginea nu este modificată, deci nu mai e nevoie de o copie.
     
     Returnează:
-      - o listă de tuple (x_cm, y_cm) deduplicate.
+      - un array (N, 2) cu coordonatele (x_cm, y_cm) ale celulelor cyan.
     """
-    mosaic_64 = create_64x64_mosaic(image_copy)
-    mosaic_64_marked = mark_red_blocks_as_cyan(mosaic_64)
-
-    mask_cyan = np.zeros((64, 64), dtype=np.uint8)
-    cyan_pixels = ((mosaic_64_marked[:,:,0] == 0) &
-                   (mosaic_64_marked[:,:,1] == 255) &
-                   (mosaic_64_marked[:,:,2] == 255))
-    mask_cyan[cyan_pixels] = 255
-    contours, _ = cv2.findContours(mask_cyan, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    ctx = as_frame_context(image_copy)
+    mosaic_64_marked = get_marked_mosaic(ctx)
 
     if debug:
-        show_opencv_windows(image_copy, mosaic_64_marked, contours)
+        mask_cyan = get_cyan_cell_mask(ctx).astype(np.uint8) * 255
+        contours, _ = cv2.findContours(mask_cyan, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        show_opencv_windows(ctx.image, mosaic_64_marked, contours)
         show_tkinter_grid(mosaic_64_marked, timeout=70000)
     
-    cyan_coords = get_cyan_block_coordinates(mosaic_64_marked)
+    cyan_coords = ctx.derive("zone_cyan_coords", lambda: get_cyan_block_coordinates(mosaic_64_marked))
 
     # Aplicăm deduplicarea: "snap-uim" fiecare coordonată la cel mai apropiat număr întreg
     deduped_coords = {(round(x), round(y)) for (x, y) in cyan_coords}
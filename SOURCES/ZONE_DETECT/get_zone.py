@@ -5,7 +5,7 @@ Modul: zone_module.py
 Acest modul procesează o imagine (de la cameră) pentru a detecta o zonă
 definită de componente conexe și convex hull. Funcția principală, detect_zone,
 primește:
-  - image_copy: o copie a imaginii (512x512) (obligatoriu),
+  - image_copy: imaginea (512x512) sau FrameContext-ul cadrului (obligatoriu),
   - positions: o poziție (tuple) sau o listă de poziții (opțional),
   - debug: flag boolean; dacă True se afișează copia imaginii cu poligonul desenat.
 
@@ -15,84 +15,189 @@ La final, funcția returnează:
   - polygon_points: lista de tuple (x, y) reprezentând punctele care alcătuiesc convex hull-ul.
 """
 
-import math
 import cv2
 import numpy as np
 from collections import deque
-from .detect_zona import detect_rotated_lines_in_mosaic
+from CAMERA.frame_context import as_frame_context
+from UTILS.calibration import cm_to_px, px_to_cm, get_model
+from UTILS.birdseye import get_default_view
+from .detect_zona import detect_rotated_lines_in_mosaic, get_cyan_cell_mask
 
 ##############################################################################
 # Funcții pentru filtrare și clusterizare (eliminarea insulelor)
 ##############################################################################
 
-def euclidean_distance(p, q):
-    return math.sqrt((p[0] - q[0])**2 + (p[1] - q[1])**2)
-
-def cluster_points(points, dist_threshold=1.0, min_cluster_size=4):
-    """
-    Grupează punctele din lista 'points' pe baza unei distanțe maxime (dist_threshold).
-    Se rețin doar clusterele cu cel puțin 'min_cluster_size' puncte.
-    """
-    clusters = []
-    visited = [False] * len(points)
-    for i, p in enumerate(points):
-        if visited[i]:
-            continue
-        cluster = []
-        queue = [i]
-        visited[i] = True
-        while queue:
-            idx = queue.pop(0)
-            cluster.append(points[idx])
-            for j, q in enumerate(points):
-                if not visited[j] and euclidean_distance(points[idx], q) <= dist_threshold:
-                    visited[j] = True
-                    queue.append(j)
-        if len(cluster) >= min_cluster_size:
-            clusters.append(cluster)
-    return clusters
+# Pragul vechi (cm) dintre două puncte din același cluster. Distanța dintre celulele vecine
+# din grila 64x64 variază cu perspectiva (0-1.1 cm pentru vecinii direcți, 0.5-2 cm la două celule),
+# deci pragul nu corespunde unei vecinătăți fixe pe grilă: se testează distanța în cm
+# pentru toate offseturile de celule la care ea poate fi sub prag.
+CLUSTER_DIST_CM = 1.0
+CLUSTER_MAX_OFFSET = 8
+
+_cluster_offsets = {"key": None, "offsets": []}
+
+def _shifted_pairs(grid, di, dj):
+    """Vederile (a, b) ale grilei pentru toate perechile de celule aflate la offsetul (di, dj), di >= 0."""
+    rows, cols = grid.shape[:2]
+    a = grid[0:rows - di, max(0, -dj):cols - max(0, dj)]
+    b = grid[di:rows, max(0, dj):cols - max(0, -dj)]
+    return a, b
+
+def cluster_offsets(shape, dist_threshold=CLUSTER_DIST_CM):
+    """
+    Offseturile (di, dj) (jumătate de plan) la care două centre de celulă pot fi la cel mult
+    'dist_threshold' cm, pentru calibrarea activă. Inelele de offseturi se parcurg până la primul
+    inel fără nicio pereche sub prag; rezultatul se recalculează doar la schimbarea modelului.
+    """
+    key = (tuple(shape), dist_threshold, get_model())
+    if _cluster_offsets["key"] != key:
+        rows, cols = shape
+        step_y, step_x = 512 // rows, 512 // cols
+        r, c = np.mgrid[0:rows, 0:cols]
+        centers = px_to_cm(np.column_stack(((c * step_x + step_x // 2).ravel(),
+                                            (r * step_y + step_y // 2).ravel()))).reshape(rows, cols, 2)
+        offsets = []
+        for ring in range(1, CLUSTER_MAX_OFFSET + 1):
+            ring_offsets = [(di, dj) for di in range(0, ring + 1) for dj in range(-ring, ring + 1)
+                            if max(di, abs(dj)) == ring and (di > 0 or dj > 0)]
+            hits = []
+            for di, dj in ring_offsets:
+                a, b = _shifted_pairs(centers, di, dj)
+                if (np.sqrt(((a - b) ** 2).sum(axis=2)) <= dist_threshold).any():
+                    hits.append((di, dj))
+            if not hits:
+                break
+            offsets.extend(hits)
+        _cluster_offsets["key"] = key
+        _cluster_offsets["offsets"] = offsets
+    return _cluster_offsets["offsets"]
+
+def _component_roots(n, u, v):
+    """Componentele conexe ale grafului (n noduri, muchii u-v): pentru fiecare nod, cel mai mic index din componentă."""
+    labels = np.arange(n)
+    while True:
+        m = np.minimum(labels[u], labels[v])
+        new = labels.copy()
+        np.minimum.at(new, u, m)
+        np.minimum.at(new, v, m)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+def cluster_cells(cell_mask, coords, dist_threshold=CLUSTER_DIST_CM, min_cluster_size=4):
+    """
+    Grupează celulele din 'cell_mask' (masca booleană 64x64) ca vechiul cluster_points:
+    două celule sunt în același cluster dacă sunt legate printr-un lanț de celule cu
+    centrele (în cm) la cel mult 'dist_threshold' una de alta.
+    'coords' conține coordonatele (cm) ale celulelor True în ordinea rând cu rând,
+    exact cum le returnează detect_rotated_lines_in_mosaic.
+    Se rețin doar clusterele cu cel puțin 'min_cluster_size' celule, în ordinea primei lor
+    celule; fiecare cluster este un array (K, 2) de coordonate în cm.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    if n == 0:
+        return []
+    index = np.full(cell_mask.shape, -1, dtype=np.int64)
+    index[cell_mask] = np.arange(n)
+    grid = np.full(cell_mask.shape + (2,), np.nan)
+    grid[cell_mask] = coords
+
+    us, vs = [], []
+    with np.errstate(invalid="ignore"):
+        for di, dj in cluster_offsets(cell_mask.shape, dist_threshold):
+            ia, ib = _shifted_pairs(index, di, dj)
+            ca, cb = _shifted_pairs(grid, di, dj)
+            linked = (ia >= 0) & (ib >= 0) & (np.sqrt(((ca - cb) ** 2).sum(axis=2)) <= dist_threshold)
+            us.append(ia[linked])
+            vs.append(ib[linked])
+    roots = _component_roots(n, np.concatenate(us) if us else np.empty(0, np.int64),
+                             np.concatenate(vs) if vs else np.empty(0, np.int64))
+    sizes = np.bincount(roots, minlength=n)
+    return [coords[roots == root] for root in np.nonzero(sizes >= min_cluster_size)[0]]
+
+# Clusterizarea pe vederea de sus (UTILS.birdseye) în loc de distanțele dintre celule; implicit dezactivată
+ZONE_USE_BIRDSEYE = False
+
+def cluster_cells_birdseye(cell_mask, coords, frame_shape=(512, 512), view=None,
+                           dist_threshold=CLUSTER_DIST_CM, min_cluster_size=4):
+    """
+    Varianta cluster_cells în coordonate de podea: masca celulelor este rectificată cu hărțile
+    remap ale BirdseyeView, petele sunt dilatate cu dist_threshold / 2 (două pete mai apropiate
+    de dist_threshold se unesc) și etichetate cu connectedComponents. Fiecare celulă primește
+    eticheta pixelului de sub centrul ei (cm). Returnează, ca cluster_cells, clusterele cu cel puțin
+    'min_cluster_size' celule (array-uri (K, 2) în cm), în ordinea etichetelor.
+    """
+    view = view or get_default_view()
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return []
+    frame_mask = cv2.resize(cell_mask.astype(np.uint8) * 255, (frame_shape[1], frame_shape[0]),
+                            interpolation=cv2.INTER_NEAREST)
+    floor = view.rectify(frame_mask, interpolation=cv2.INTER_NEAREST)
+    radius = int(round(dist_threshold / 2 / view.cm_per_px))
+    if radius > 0:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+        floor = cv2.dilate(floor, kernel)
+    n_labels, labels = cv2.connectedComponents((floor > 0).astype(np.uint8), connectivity=8)
+
+    grid = np.round(view.cm_to_grid(coords)).astype(np.int64)
+    inside = ((grid[:, 0] >= 0) & (grid[:, 0] < view.width) &
+              (grid[:, 1] >= 0) & (grid[:, 1] < view.height))
+    cell_labels = np.zeros(len(coords), dtype=np.int64)
+    cell_labels[inside] = labels[grid[inside, 1], grid[inside, 0]]
+    sizes = np.bincount(cell_labels, minlength=n_labels)
+    sizes[0] = 0  # fundalul (sau în afara grilei)
+    return [coords[cell_labels == label] for label in np.nonzero(sizes >= min_cluster_size)[0]]
 
 ##############################################################################
 # Funcții pentru convex hull și testul de interior
 ##############################################################################
 
-def cross(o, a, b):
-    return (a[0] - o[0])*(b[1] - o[1]) - (a[1] - o[1])*(b[0] - o[0])
-
 def convex_hull(points):
-    points = sorted(set(points))
-    if len(points) <= 1:
-        return points
-    lower = []
-    for p in points:
-        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
-            lower.pop()
-        lower.append(p)
-    upper = []
-    for p in reversed(points):
-        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
-            upper.pop()
-        upper.append(p)
-    return lower[:-1] + upper[:-1]
+    """Convex hull-ul unui array (K, 2) de puncte, ca listă de tuple (x, y)."""
+    points = np.unique(np.asarray(points, dtype=np.float32).reshape(-1, 2), axis=0)
+    if len(points) <= 2:
+        return [tuple(p) for p in points.tolist()]
+    hull = cv2.convexHull(points).reshape(-1, 2)
+    return [tuple(p) for p in hull.tolist()]
 
-def point_in_poly(x, y, poly):
-    inside = False
-    n = len(poly)
-    if n == 0:
-        return False
-    p1x, p1y = poly[0]
-    for i in range(1, n+1):
-        p2x, p2y = poly[i % n]
-        if min(p1y, p2y) < y <= max(p1y, p2y):
-            if p1y != p2y:
-                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-            else:
-                xinters = p1x
-            if x <= xinters:
-                inside = not inside
-        p1x, p1y = p2x, p2y
+def points_in_poly(points, poly, include_boundary=False):
+    """
+    Testul de interior (ray casting) pentru un lot de puncte: 'points' este un array (N, 2)
+    sau o listă de tuple (x, y). Toate laturile poligonului sunt testate simultan, prin broadcasting
+    pe o matrice N x laturi. Returnează o mască booleană de lungime N.
+    Ray casting-ul singur tratează marginea asimetric (unele laturi incluse, altele nu);
+    cu include_boundary=True punctele aflate pe orice latură sunt considerate în interior,
+    ca la cv2.pointPolygonTest(...) >= 0.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(poly) == 0 or len(pts) == 0:
+        return np.zeros(len(pts), dtype=bool)
+    p1 = np.asarray(poly, dtype=np.float64).reshape(-1, 2)
+    p2 = np.roll(p1, -1, axis=0)
+    p1x, p1y, p2x, p2y = p1[:, 0], p1[:, 1], p2[:, 0], p2[:, 1]
+    x = pts[:, 0:1]
+    y = pts[:, 1:2]
+
+    # Laturile orizontale nu pot îndeplini condiția strictă de mai jos, deci numitorul lor nu contează
+    dy = np.where(p1y != p2y, p2y - p1y, 1.0)
+    crosses = (np.minimum(p1y, p2y) < y) & (y <= np.maximum(p1y, p2y))
+    xinters = (y - p1y) * (p2x - p1x) / dy + p1x
+    inside = np.count_nonzero(crosses & (x <= xinters), axis=1) % 2 == 1
+    if include_boundary:
+        ex, ey = p2x - p1x, p2y - p1y
+        length2 = ex * ex + ey * ey
+        cross = ex * (y - p1y) - ey * (x - p1x)
+        dot = ex * (x - p1x) + ey * (y - p1y)
+        on_edge = (np.abs(cross) <= 1e-9 * np.maximum(length2, 1.0)) & (dot >= 0) & (dot <= length2)
+        inside |= on_edge.any(axis=1)
     return inside
 
+def point_in_poly(x, y, poly):
+    return bool(points_in_poly([(x, y)], poly)[0])
+
 ##############################################################################
 # Funcția de conversie: cm -> pixeli (folosind relațiile inverse)
 ##############################################################################
@@ -116,58 +221,99 @@ def getDetectedCoordinates(real_x, real_y):
       4. Se inversează rotația de 180°:
             detected_x = (width - 1) - rotated_x
             detected_y = (height - 1) - rotated_y
+
+    Formulele sunt cele din UTILS.calibration (cm_to_px).
+    """
+    detected_x, detected_y = cm_to_px([(real_x, real_y)])[0]
+    return int(detected_x), int(detected_y)
+
+
+##############################################################################
+# Cache-ul zonei cât timp robotul stă pe loc
+##############################################################################
+
+# Amprenta cadrului: imaginea redusă prin INTER_AREA (mult mai ieftină decât mozaicul zonei)
+ZONE_SIGNATURE_SIZE = (64, 64)
+# O celulă a amprentei este considerată schimbată dacă un canal diferă cu mai mult de atât
+ZONE_CELL_CHANGE = 24
+# Fracțiunea de celule schimbate peste care zona se recalculează
+ZONE_CHANGE_THRESHOLD = 0.01
+
+class ZoneCache:
+    """
+    Păstrează ultimul rezultat al zonei (limite + hull) împreună cu amprenta 64x64 a cadrului
+    din care a fost calculat și id-ul ultimei comenzi de mișcare.
+    Rezultatul rămâne valid până când robotul primește o comandă nouă (motion_id diferit)
+    sau imaginea se schimbă material față de cadrul de referință.
     """
-    width, height = 512, 512
+    def __init__(self, change_threshold=ZONE_CHANGE_THRESHOLD, cell_change=ZONE_CELL_CHANGE):
+        self.change_threshold = change_threshold
+        self.cell_change = cell_change
+        self.reset()
 
-    # Pasul 1: Inversul get_real_y pentru a obține rotated_y
-    rotated_y = (real_y + 4.47) / 0.05587
+    def reset(self):
+        self._signature = None
+        self._motion_id = None
+        self._result = None
 
-    # Pasul 2: Calculăm center_x și scale_x pentru rotated_y
-    center_x = 0.0203 * rotated_y + 230.38
-    scale_x = 0.0000608 * rotated_y + 0.046936
-    # Inversul calculului pentru real_x:
-    rotated_x = (real_x / scale_x) + center_x
+    def frame_change(self, signature):
+        """Fracțiunea de celule ale amprentei care diferă de cadrul de referință."""
+        if self._signature is None or self._signature.shape != signature.shape:
+            return 1.0
+        diff = np.abs(signature.astype(np.int16) - self._signature.astype(np.int16))
+        if diff.ndim == 3:
+            diff = diff.max(axis=2)
+        return np.count_nonzero(diff > self.cell_change) / diff.size
 
-    # Pasul 3: Inversăm rotația de 180°
-    detected_x = (width - 1) - rotated_x
-    detected_y = (height - 1) - rotated_y
+    def get(self, signature, motion_id=None):
+        """Rezultatul memorat, sau None dacă robotul s-a mișcat ori imaginea s-a schimbat."""
+        if self._result is None:
+            return None
+        if motion_id is not None and motion_id != self._motion_id:
+            return None
+        if self.frame_change(signature) > self.change_threshold:
+            return None
+        return self._result
 
-    return int(detected_x), int(detected_y)
+    def store(self, signature, motion_id, result):
+        self._signature = signature
+        self._motion_id = motion_id
+        self._result = result
+
+_zone_cache = ZoneCache()
 
+def reset_zone_cache():
+    """Forțează recalcularea zonei la următorul apel detect_zone."""
+    _zone_cache.reset()
 
 ##############################################################################
 # Funcția principală de procesare a zonei
 ##############################################################################
 
-def detect_zone(image_copy, positions=None, debug=False):
+def compute_zone(image_copy, debug=False, birdseye=None):
     """
-    Procesează imaginea pentru a detecta zona definită de punctele clusterizate și convex hull.
-    
-    Pași:
-      1. Se obțin coordonatele brute (în cm) din imagine folosind detect_rotated_lines_in_mosaic.
-      2. Se clusterizează punctele pentru a elimina insulele mici.
-      3. Se selectează cel mai mare cluster și se calculează convex hull-ul acestuia.
-      4. Se determină limitele extreme ale zonei din hull.
-      5. (Opțional) Se verifică, pentru fiecare poziție dată, dacă se află în interiorul hull-ului.
-      6. Dacă debug==True, se afișează copia imaginii cu poligonul convertit din cm în pixeli, desenat pe ea.
-    
-    Returnează:
-      - zone_limits: dicționar cu "left", "right", "top", "bottom"
-      - pos_flags: listă de 1/0 pentru fiecare poziție
-      - polygon_points: convex hull-ul (listă de puncte în cm)
+    Pașii 1-4 din detect_zone, fără cache: returnează (zone_limits, hull).
+    birdseye: clusterizarea pe vederea de sus (cluster_cells_birdseye); None = ZONE_USE_BIRDSEYE.
     """
-    # 1) Obține coordonatele brute (în cm)
-    coords_raw = detect_rotated_lines_in_mosaic(image_copy, debug=debug)
+    ctx = as_frame_context(image_copy)
+
+    # 1) Obține coordonatele brute (în cm) și masca celulelor din care provin
+    coords_raw = detect_rotated_lines_in_mosaic(ctx, debug=debug)
+    cell_mask = get_cyan_cell_mask(ctx)
     
-    # 2) Clusterizează punctele pentru a elimina insulele mici
-    clusters = cluster_points(coords_raw, dist_threshold=1.0, min_cluster_size=4)
+    # 2) Clusterizează celulele (componente conexe pe grilă) pentru a elimina insulele mici
+    use_birdseye = ZONE_USE_BIRDSEYE if birdseye is None else birdseye
+    if use_birdseye:
+        clusters = cluster_cells_birdseye(cell_mask, coords_raw, frame_shape=ctx.shape[:2], min_cluster_size=4)
+    else:
+        clusters = cluster_cells(cell_mask, coords_raw, min_cluster_size=4)
     if clusters:
         largest_cluster = max(clusters, key=len)
     else:
-        largest_cluster = []
+        largest_cluster = None
     
     # 3) Calculează convex hull-ul pentru clusterul selectat
-    if largest_cluster:
+    if largest_cluster is not None:
         hull = convex_hull(largest_cluster)
     else:
         hull = []
@@ -182,25 +328,51 @@ def detect_zone(image_copy, positions=None, debug=False):
         right_bound = left_bound = top_bound = bottom_bound = 999
     zone_limits = {"left": left_bound, "right": right_bound,
                    "top": top_bound, "bottom": bottom_bound}
+    return zone_limits, hull
+
+def detect_zone(image_copy, positions=None, debug=False, motion_id=None, use_cache=True):
+    """
+    Procesează imaginea pentru a detecta zona definită de punctele clusterizate și convex hull.
+    
+    Pași:
+      1. Se obțin coordonatele brute (în cm) din imagine folosind detect_rotated_lines_in_mosaic.
+      2. Se clusterizează punctele pentru a elimina insulele mici.
+      3. Se selectează cel mai mare cluster și se calculează convex hull-ul acestuia.
+      4. Se determină limitele extreme ale zonei din hull.
+      5. (Opțional) Se verifică, pentru fiecare poziție dată, dacă se află în interiorul hull-ului.
+      6. Dacă debug==True, se afișează copia imaginii cu poligonul convertit din cm în pixeli, desenat pe ea.
+    
+    Pașii 1-4 sunt sări peste dacă use_cache=True și ZoneCache are un rezultat valid: același
+    motion_id (id-ul ultimei comenzi de mișcare, dacă apelantul îl cunoaște) și un mozaic
+    practic neschimbat. Cu debug=True zona se recalculează mereu.
+    
+    Returnează:
+      - zone_limits: dicționar cu "left", "right", "top", "bottom"
+      - pos_flags: listă de 1/0 pentru fiecare poziție
+      - polygon_points: convex hull-ul (listă de puncte în cm)
+    """
+    ctx = as_frame_context(image_copy)
+
+    # 1-4) Zona din cache dacă robotul nu s-a mișcat, altfel recalculată
+    signature = ctx.resized(ZONE_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    cached = _zone_cache.get(signature, motion_id) if use_cache and not debug else None
+    if cached is None:
+        cached = compute_zone(ctx, debug=debug)
+        _zone_cache.store(signature, motion_id, cached)
+    zone_limits, hull = dict(cached[0]), list(cached[1])
     
-    # 5) Verifică pozițiile furnizate, dacă există, folosind testul de apartenență la hull
+    # 5) Verifică pozițiile furnizate, dacă există, printr-un singur test de apartenență la hull
     pos_flags = []
     if positions is not None:
         if isinstance(positions, tuple) and len(positions) == 2 and isinstance(positions[0], (int, float)):
             positions = [positions]
-        for pos in positions:
-            x, y = pos
-            if hull and point_in_poly(x, y, hull):
-                pos_flags.append(1)
-            else:
-                pos_flags.append(0)
+        pos_flags = points_in_poly(positions, hull).astype(int).tolist()
     
     # 6) Dacă debug==True, afișează copia imaginii cu poligonul desenat (convertit din cm în pixeli)
     if debug:
-        debug_img = image_copy.copy()
+        debug_img = ctx.image.copy()
         if hull and len(hull) >= 3:
-            pts = [getDetectedCoordinates(x, y) for (x, y) in hull]
-            pts_array = np.array(pts, dtype=np.int32)
+            pts_array = cm_to_px(hull).astype(np.int32)
             cv2.polylines(debug_img, [pts_array], isClosed=True, color=(255, 0, 0), thickness=2)
         # Adăugăm punctele suplimentare: (+5,0), (-5,0), (0,+5) și (0,-5)
         extra_points = {